@@ -1,12 +1,13 @@
 {
     'name': 'Collect map',
-    'version': '1.0',
+    'version': '1.1',
     'depends': ['base', 'fleet', 'mail', 'hr', 'auth_signup', 'web'],
     'sequence': 20,
     'author': 'Oumaima',
     'category': 'Fleet Management',
     'summary': 'Collect module for managing Medical Trash collection',
     'data': [
+        'data/collecte_config_parameter.xml',
         'data/tracking_cron.xml',
         'data/bs_sequence.xml',
         'security/ir.model.access.csv',
@@ -17,6 +18,7 @@
         'wizard/traccar_track_history_wizard_view.xml',
         'wizard/deletion_confirmation_wizard_view.xml',
         'views/collect_bordereau_views.xml',
+        'views/collect_planning_run.xml',
         'views/collect_action_menu.xml',
         'views/collect_menu.xml',
         'wizard/realtime_tracking_wizard_view.xml',
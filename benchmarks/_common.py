@@ -0,0 +1,63 @@
+"""Helpers shared by the benchmark scripts."""
+import importlib.util
+import math
+import pathlib
+import random
+import sys
+
+TOOLS_DIR = pathlib.Path(__file__).resolve().parent.parent / 'tools'
+
+# Centres approximatifs des gouvernorats et poids relatif des clients
+ZONES = {
+    'ariana': ((36.86, 10.19), 5), 'beja': ((36.73, 9.18), 2), 'ben_arous': ((36.75, 10.23), 5),
+    'bizerte': ((37.27, 9.87), 3), 'gabes': ((33.88, 10.10), 2), 'gafsa': ((34.42, 8.78), 2),
+    'jendouba': ((36.50, 8.78), 2), 'kairouan': ((35.68, 10.10), 3), 'kasserine': ((35.17, 8.84), 2),
+    'kebili': ((33.70, 8.97), 1), 'kef': ((36.17, 8.70), 1), 'mahdia': ((35.50, 11.06), 2),
+    'manouba': ((36.81, 10.10), 3), 'medenine': ((33.35, 10.50), 2), 'monastir': ((35.77, 10.83), 3),
+    'nabeul': ((36.45, 10.74), 4), 'sfax': ((34.74, 10.76), 6), 'sidi_bouzid': ((35.04, 9.48), 2),
+    'siliana': ((36.08, 9.37), 1), 'sousse': ((35.83, 10.64), 5), 'tataouine': ((32.93, 10.45), 1),
+    'tozeur': ((33.92, 8.13), 1), 'tunis': ((36.80, 10.18), 10), 'zaghouan': ((36.40, 10.14), 1),
+}
+DEPOT = (36.37065151015154, 9.111696141592383)
+
+
+def load_tools():
+    """Import the addon's ``tools`` package without Odoo, as ``collecte_tools``."""
+    if 'collecte_tools' not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            'collecte_tools', TOOLS_DIR / '__init__.py', submodule_search_locations=[str(TOOLS_DIR)])
+        module = importlib.util.module_from_spec(spec)
+        sys.modules['collecte_tools'] = module
+        spec.loader.exec_module(module)
+    return sys.modules['collecte_tools']
+
+
+def synthetic_clients(n, seed=0):
+    """``n`` clients spread over the governorates, around their centres.
+
+    Each client is a dict with ``zone``, ``lat``, ``lon``, ``quantite`` (kg
+    per passage) and one of the three schedule settings of ``res.partner``.
+    """
+    rng = random.Random(seed)
+    names = list(ZONES)
+    weights = [ZONES[z][1] for z in names]
+    clients = []
+    for i in range(n):
+        zone = rng.choices(names, weights)[0]
+        (lat, lon), _ = ZONES[zone]
+        # ~15 km autour du centre
+        radius = abs(rng.gauss(0, 0.12))
+        angle = rng.uniform(0, 2 * math.pi)
+        schedule = rng.random()
+        clients.append({
+            'zone': zone,
+            'lat': round(lat + radius * math.sin(angle), 5),
+            'lon': round(lon + radius * math.cos(angle), 5),
+            'quantite': round(rng.lognormvariate(3.0, 0.8), 1),
+            # La fréquence est obligatoire sur le client ; passages et jour fixe s'y ajoutent
+            'frequence_collecte': rng.choice(['2', '3', '7', '15', '30']),
+            'nbre_passage_semaine': rng.choice(['1', '2', '3']) if 0.5 <= schedule < 0.8 else False,
+            'jour_fixe': rng.choice(['lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi', 'samedi'])
+            if schedule >= 0.8 else False,
+        })
+    return clients
@@ -0,0 +1,248 @@
+"""A local stand-in for the Traccar API, used by the benchmark scripts.
+
+Serves ``/api/positions`` (current snapshot, or an empty history when
+``deviceId`` is given), ``/api/devices`` and ``/api/session`` over HTTP/1.1
+keep-alive from a background thread. Failures and delays can be injected,
+and every request records the client port it came from, so the scripts can
+check retries and connection reuse.
+
+``/api/socket`` accepts WebSocket connections carrying the cookie of a
+live session, like Traccar; :meth:`FakeTraccar.push` sends positions to the
+connected sockets and :meth:`FakeTraccar.restart` drops the sockets and the
+sessions, as a server restart would.
+"""
+import base64
+import hashlib
+import json
+import queue
+import random
+import struct
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+START = datetime(2026, 1, 5, 6, 0, tzinfo=timezone.utc)
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+def ws_frame(payload, opcode=0x1):
+    """Unmasked server frame (text by default)."""
+    header = bytes([0x80 | opcode])
+    if len(payload) < 126:
+        header += bytes([len(payload)])
+    elif len(payload) < 65536:
+        header += bytes([126]) + struct.pack('!H', len(payload))
+    else:
+        header += bytes([127]) + struct.pack('!Q', len(payload))
+    return header + payload
+
+
+class FakeTraccar:
+    """Fake server for ``devices`` GPS devices, with ids ``1..devices``.
+
+    :meth:`tick` advances the simulated fleet by one polling interval and
+    returns what a correct consumer should apply from the new snapshot.
+    """
+
+    def __init__(self, devices=0, seed=0):
+        self.rng = random.Random(seed)
+        self.positions = {}
+        self.ticks = 0
+        self.next_position_id = 1
+        self.device_count = devices
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.client_ports = set()
+        # Réponses 503 à renvoyer avant de répondre normalement, et latence ajoutée
+        self.fail_next = 0
+        self.delay = 0.0
+        # Sessions ouvertes (valeur du cookie), sockets connectées et leur cookie
+        self.sessions = set()
+        self.logins = 0
+        self.sockets = []
+        self.socket_cookies = []
+        self.rejected_sockets = 0
+        self._server = None
+
+    # ---------------------------------------------------------------- fleet
+    def _fix(self, device_id, lat, lon, speed, fix_time):
+        position = {
+            'id': self.next_position_id,
+            'deviceId': device_id,
+            'latitude': round(lat, 6),
+            'longitude': round(lon, 6),
+            'speed': speed,
+            'course': round(self.rng.uniform(0, 360), 1),
+            'fixTime': fix_time.strftime('%Y-%m-%dT%H:%M:%S.000+00:00') if fix_time else None,
+        }
+        self.next_position_id += 1
+        return position
+
+    def tick(self):
+        """Advance every device; return ``{'applied': n, 'moved': n, 'no_fix_time': [device_id]}``.
+
+        From the second tick on, each device either resends its last
+        position (5 %), reports a new position without ``fixTime`` (5 %),
+        stays where it was (30 %) or moves (60 %).
+        """
+        with self.lock:
+            self.ticks += 1
+            fix_time = START + timedelta(seconds=30 * self.ticks)
+            expected = {'applied': 0, 'moved': 0, 'no_fix_time': []}
+            for device_id in range(1, self.device_count + 1):
+                last = self.positions.get(device_id)
+                draw = self.rng.random()
+                if last is None:
+                    lat, lon = 36.8 + self.rng.uniform(-0.5, 0.5), 10.18 + self.rng.uniform(-0.5, 0.5)
+                    self.positions[device_id] = self._fix(device_id, lat, lon, 20.0, fix_time)
+                    expected['applied'] += 1
+                    expected['moved'] += 1
+                elif draw < 0.05:
+                    continue
+                elif draw < 0.10:
+                    self.positions[device_id] = self._fix(
+                        device_id, last['latitude'] + 0.001, last['longitude'], last['speed'], None)
+                    expected['applied'] += 1
+                    expected['no_fix_time'].append(device_id)
+                elif draw < 0.40:
+                    self.positions[device_id] = self._fix(
+                        device_id, last['latitude'], last['longitude'], last['speed'], fix_time)
+                    expected['applied'] += 1
+                else:
+                    self.positions[device_id] = self._fix(
+                        device_id, last['latitude'] + self.rng.uniform(-0.002, 0.002),
+                        last['longitude'] + self.rng.uniform(-0.002, 0.002), 35.0, fix_time)
+                    expected['applied'] += 1
+                    expected['moved'] += 1
+            return expected
+
+    # --------------------------------------------------------------- socket
+    def push(self, positions):
+        """Send ``positions`` to every connected socket, as one message."""
+        message = json.dumps({'positions': positions})
+        with self.lock:
+            for outbox in self.sockets:
+                outbox.put(message)
+
+    def restart(self):
+        """Close every socket and forget every session."""
+        with self.lock:
+            for outbox in self.sockets:
+                outbox.put(None)
+            self.sockets = []
+            self.sessions.clear()
+
+    def connected(self):
+        with self.lock:
+            return len(self.sockets)
+
+    # --------------------------------------------------------------- server
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, payload=None, headers=()):
+                body = json.dumps(payload).encode() if payload is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _serve(self):
+                url = urlparse(self.path)
+                with fake.lock:
+                    fake.requests[url.path] += 1
+                    fake.client_ports.add(self.client_address[1])
+                    failing = fake.fail_next > 0
+                    if failing:
+                        fake.fail_next -= 1
+                if fake.delay:
+                    threading.Event().wait(fake.delay)
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    self.rfile.read(length)
+                if failing:
+                    return self._reply(503, {'error': 'injected failure'})
+                if url.path == '/api/socket':
+                    return self._websocket()
+                if url.path == '/api/session':
+                    with fake.lock:
+                        fake.logins += 1
+                        session = f'fake{fake.logins}'
+                        fake.sessions.add(session)
+                    return self._reply(200, {'id': 1}, [('Set-Cookie', f'JSESSIONID={session}; Path=/')])
+                if url.path == '/api/devices':
+                    return self._reply(200, [{'id': d, 'name': f'Device {d}', 'uniqueId': str(d)}
+                                             for d in range(1, fake.device_count + 1)])
+                if url.path == '/api/positions':
+                    if 'deviceId' in parse_qs(url.query):
+                        return self._reply(200, [])
+                    with fake.lock:
+                        return self._reply(200, list(fake.positions.values()))
+                return self._reply(404, {'error': 'not found'})
+
+            def _websocket(self):
+                cookies = dict(part.strip().split('=', 1) for part in (self.headers.get('Cookie') or '').split(';')
+                               if '=' in part)
+                with fake.lock:
+                    valid = cookies.get('JSESSIONID') in fake.sessions
+                    if not valid:
+                        fake.rejected_sockets += 1
+                if not valid or 'websocket' not in (self.headers.get('Upgrade') or '').lower():
+                    self.close_connection = True
+                    return self._reply(401, {'error': 'session required'})
+                accept = base64.b64encode(hashlib.sha1(
+                    (self.headers['Sec-WebSocket-Key'] + WS_GUID).encode()).digest()).decode()
+                self.send_response(101)
+                self.send_header('Upgrade', 'websocket')
+                self.send_header('Connection', 'Upgrade')
+                self.send_header('Sec-WebSocket-Accept', accept)
+                self.end_headers()
+                self.wfile.flush()
+                outbox = queue.Queue()
+                with fake.lock:
+                    fake.sockets.append(outbox)
+                    fake.socket_cookies.append(cookies['JSESSIONID'])
+                self.close_connection = True
+                try:
+                    while True:
+                        message = outbox.get()
+                        if message is None:
+                            self.wfile.write(ws_frame(struct.pack('!H', 1001), opcode=0x8))
+                            return
+                        self.wfile.write(ws_frame(message.encode()))
+                        self.wfile.flush()
+                except OSError:
+                    pass
+                finally:
+                    with fake.lock:
+                        if outbox in fake.sockets:
+                            fake.sockets.remove(outbox)
+
+            do_GET = do_POST = _serve
+
+        return Handler
+
+    def start(self):
+        """Serve on a free local port; return the base URL."""
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def stop(self):
+        self.restart()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
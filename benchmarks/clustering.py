@@ -0,0 +1,119 @@
+"""Route-splitting quality of the clustering engines on synthetic days.
+
+For each dataset size, the stops of one day are clustered by:
+
+* ``balanced`` - ``tools.clustering.balanced_clusters`` on projected
+  coordinates with the vehicle capacities as budgets;
+* ``kmeans-dist-zone`` - the former daily planner features
+  ``[distance to depot, governorate index * weight]``;
+* ``kmeans-latlon`` - the former monthly fallback, KMeans on raw lat/lon.
+
+The KMeans variants need scikit-learn and are skipped without it. Each
+clustering then goes through the daily planner's capacity split (one
+vehicle per cluster, overflow onto the next vehicle). Reported: mean
+distance to the cluster centroid (km), vehicles used, unserved kg, time.
+
+Usage::
+
+    python benchmarks/clustering.py [--sizes 100 500 2000 5000] [--capacity 3000] [--output clustering.json]
+"""
+import argparse
+import json
+import math
+import time
+
+from _common import DEPOT, ZONES, load_tools, synthetic_clients
+
+tools = load_tools()
+from collecte_tools.clustering import balanced_clusters, clusters_needed, compactness, project  # noqa: E402
+
+
+def split_by_capacity(clusters, capacities):
+    """The daily planner's split: returns (vehicles used, unserved kg)."""
+    vehicle_index, used = 0, 0
+    unserved = 0.0
+    for pts in clusters:
+        pts = sorted(pts, key=lambda p: p['dist'])
+        while pts and vehicle_index < len(capacities):
+            load, remaining = 0.0, []
+            for pt in pts:
+                if load + pt['quantite'] <= capacities[vehicle_index]:
+                    load += pt['quantite']
+                else:
+                    remaining.append(pt)
+            used += 1 if load else 0
+            pts = remaining
+            vehicle_index += 1
+        unserved += sum(pt['quantite'] for pt in pts)
+    return used, unserved
+
+
+def engines():
+    yield 'balanced', lambda points, xy, capacities: balanced_clusters(
+        xy, [p['quantite'] for p in points],
+        capacities[:clusters_needed(sum(p['quantite'] for p in points), capacities)])
+    try:
+        from sklearn.cluster import KMeans
+    except ImportError:
+        return
+
+    def dist_zone(points, xy, capacities):
+        zones = {z: i for i, z in enumerate(sorted({p['zone'] for p in points}))}
+        weight = max(p['dist'] for p in points) * 2.0
+        features = [[p['dist'], zones[p['zone']] * weight] for p in points]
+        return KMeans(n_clusters=min(len(points), len(capacities)), random_state=0).fit(features).labels_
+
+    def latlon(points, xy, capacities):
+        features = [[p['lat'], p['lon']] for p in points]
+        return KMeans(n_clusters=min(len(points), len(capacities)), random_state=42, n_init="auto").fit_predict(features)
+
+    yield 'kmeans-dist-zone', dist_zone
+    yield 'kmeans-latlon', latlon
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 500, 2000, 5000])
+    parser.add_argument('--capacity', type=float, default=3000.0, help="capacity of each vehicle (kg)")
+    parser.add_argument('--fleet-margin', type=float, default=1.5, help="fleet capacity / daily demand")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        points = synthetic_clients(size, seed=args.seed)
+        xy = project([(p['lat'], p['lon']) for p in points], DEPOT)
+        for p, (x, y) in zip(points, xy):
+            p['dist'] = math.hypot(x, y)
+        total = sum(p['quantite'] for p in points)
+        capacities = [args.capacity] * max(1, math.ceil(total * args.fleet_margin / args.capacity))
+        for name, engine in engines():
+            started = time.perf_counter()
+            labels = [int(label) for label in engine(points, xy, capacities)]
+            elapsed = time.perf_counter() - started
+            clusters = {}
+            for p, label in zip(points, labels):
+                clusters.setdefault(label, []).append(p)
+            used, unserved = split_by_capacity([clusters[c] for c in sorted(clusters)], capacities)
+            row = {
+                'clients': size,
+                'engine': name,
+                'fleet': len(capacities),
+                'min_vehicles': math.ceil(total / args.capacity),
+                'vehicles_used': used,
+                'unserved_kg': round(unserved, 1),
+                'compactness_km': round(compactness(xy, labels), 2),
+                'seconds': round(elapsed, 3),
+            }
+            results.append(row)
+            print(f"{size:>6} {name:<18} vehicles {used:>4}/{row['min_vehicles']:<4} "
+                  f"unserved {row['unserved_kg']:>9} kg  compactness {row['compactness_km']:>7} km  "
+                  f"{row['seconds']:>7} s")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'zones': len(ZONES), 'capacity_kg': args.capacity, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
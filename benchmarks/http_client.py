@@ -0,0 +1,110 @@
+"""Outbound HTTP layer against a local stub server, without Odoo.
+
+Runs ``tools/http_client.py`` against :class:`_fake_traccar.FakeTraccar` and
+checks:
+
+* keep-alive: calls from several threads, through a new executor per batch
+  as the sync and the distance matrices do, share a small set of pooled
+  connections;
+* retries: injected 503 answers are retried and the call succeeds;
+* circuit breaker: it opens after ``BREAKER_THRESHOLD`` failures and fails
+  fast; once half-open it lets a single probe through, and the concurrent
+  callers get :class:`ServiceUnavailable` without reaching the server.
+
+Usage::
+
+    python benchmarks/http_client.py [--calls 400] [--threads 8]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import load_tools  # noqa: E402
+from _fake_traccar import FakeTraccar  # noqa: E402
+
+load_tools()
+from collecte_tools import http_client  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    fake = FakeTraccar(devices=50)
+    fake.tick()
+    client = http_client.ServiceClient('traccar', fake.start(), timeout=5.0, retries=2)
+    failures = []
+
+    # 1) Connexions réutilisées entre threads et entre exécuteurs successifs
+    started = time.perf_counter()
+    batch = args.threads * 5
+    for start in range(0, args.calls, batch):
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            list(executor.map(lambda _: client.get_json('/api/positions'), range(min(batch, args.calls - start))))
+    elapsed = time.perf_counter() - started
+    connections = len(fake.client_ports)
+    print(f"keep-alive: {args.calls} calls from {args.threads} threads in {elapsed:.2f} s "
+          f"over {connections} connection(s)")
+    if connections > args.threads:
+        failures.append(f"{connections} connections for {args.threads} threads")
+
+    # 2) Réessais sur 503
+    fake.fail_next = 2
+    before = fake.requests['/api/devices']
+    client.get_json('/api/devices', backoff=0.01)
+    sent = fake.requests['/api/devices'] - before
+    print(f"retries: 2 injected 503, call succeeded after {sent} request(s)")
+    if sent != 3:
+        failures.append(f"retries sent {sent} requests, expected 3")
+
+    # 3) Disjoncteur : ouverture, échec immédiat, un seul essai en demi-ouvert
+    breaker = http_client._breaker('traccar')
+    breaker.reset_after = 0.5
+    fake.fail_next = 10 ** 6
+    before = fake.requests['/api/devices']
+    for _ in range(http_client.BREAKER_THRESHOLD):
+        try:
+            client.get_json('/api/devices', retries=0)
+        except Exception:
+            pass
+    try:
+        client.get_json('/api/devices', retries=0)
+        failures.append("breaker did not open")
+    except http_client.ServiceUnavailable:
+        pass
+    print(f"breaker: {breaker.failures} failures, state {breaker.state}, "
+          f"{fake.requests['/api/devices'] - before} request(s) reached the server")
+
+    time.sleep(breaker.reset_after)
+    fake.fail_next = 0
+    fake.delay = 0.3
+    before = fake.requests['/api/devices']
+
+    def call(_):
+        try:
+            client.get_json('/api/devices', retries=0)
+            return 'ok'
+        except http_client.ServiceUnavailable:
+            return 'rejected'
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        outcomes = list(executor.map(call, range(16)))
+    probes = fake.requests['/api/devices'] - before
+    print(f"half-open: 16 concurrent calls, {probes} probe(s) reached the server, "
+          f"{outcomes.count('rejected')} rejected, breaker {breaker.state}")
+    if probes != 1 or outcomes.count('ok') != 1:
+        failures.append(f"half-open let {probes} call(s) through")
+    if breaker.state != 'closed':
+        failures.append("breaker not closed after a successful probe")
+
+    fake.stop()
+    print("All checks passed" if not failures else "FAILED: " + '; '.join(failures))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
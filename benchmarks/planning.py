@@ -0,0 +1,180 @@
+"""Monthly and daily planners on synthetic clients.
+
+Runs inside an Odoo shell, from the addon directory, and rolls everything
+back::
+
+    odoo-bin shell -d <db> --no-http < benchmarks/planning.py
+
+For each size, synthetic clients are spread over the 24 governorates with
+mixed ``frequence_collecte`` / ``nbre_passage_semaine`` / ``jour_fixe``
+settings; existing clients and vehicles are archived for the run. The
+monthly planner generates the current month, then the daily planner builds
+the tours of its busiest day. Recorded per planner: wall time, solve time,
+SQL queries, peak Python memory (tracemalloc, solver processes excluded)
+and route quality (km, vehicles used, unserved stops).
+
+Environment variables:
+
+* ``SIZES`` - comma-separated client counts (default ``100,500,2000,5000``);
+* ``VEHICLES`` / ``CAPACITY`` - fleet size and ``capacity_kg`` (default 10 x 3000);
+* ``SOLUTION_LIMIT`` / ``WORKERS`` - solver settings for the run;
+* ``OUTPUT`` - JSON result file (default ``planning_benchmark.json``).
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.getcwd(), 'benchmarks'))
+from _common import DEPOT, load_tools, synthetic_clients  # noqa: E402
+
+load_tools()
+from collecte_tools.routing import haversine_km  # noqa: E402
+from collecte_tools.schedule import collection_mask, planning_days  # noqa: E402
+
+SIZES = [int(s) for s in os.environ.get('SIZES', '100,500,2000,5000').split(',')]
+VEHICLES = int(os.environ.get('VEHICLES', 10))
+CAPACITY = float(os.environ.get('CAPACITY', 3000))
+OUTPUT = os.environ.get('OUTPUT', 'planning_benchmark.json')
+
+env = env  # noqa: F821 - fourni par odoo-bin shell
+cr = env.cr
+
+
+def measure(func):
+    """Run ``func`` and return ``(result, metrics)``."""
+    env.flush_all()
+    queries = cr.sql_log_count
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    env.flush_all()
+    wall = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {
+        'wall_s': round(wall, 2),
+        'queries': cr.sql_log_count - queries,
+        'peak_mb': round(peak / 1024 / 1024, 1),
+    }
+
+
+def path_km(stops):
+    """Depot -> stops -> depot great-circle length."""
+    points = [DEPOT] + stops + [DEPOT]
+    return sum(haversine_km(a, b) for a, b in zip(points, points[1:]))
+
+
+def setup_fleet():
+    cr.execute("UPDATE fleet_vehicle SET active = false")
+    brand = env['fleet.vehicle.model.brand'].create({'name': 'Bench'})
+    model = env['fleet.vehicle.model'].create({'name': 'Bench truck', 'brand_id': brand.id})
+    return env['fleet.vehicle'].create([
+        {'model_id': model.id, 'license_plate': f'BENCH-{i}', 'capacity_kg': CAPACITY} for i in range(VEHICLES)
+    ])
+
+
+def setup_clients(size):
+    cr.execute("UPDATE res_partner SET active = false WHERE quantite_estimee > 0 OR quantite_previsionnelle > 0")
+    env.invalidate_all()
+    clients = synthetic_clients(size)
+    partners = env['res.partner'].with_context(tracking_disable=True).create([{
+        'name': f'Bench {i}',
+        'type_contrat': 'passage',
+        'latitude': c['lat'],
+        'longitude': c['lon'],
+        'zone': c['zone'],
+        'quantite_estimee': c['quantite'] * 4,
+        'frequence_collecte': c['frequence_collecte'],
+        'nbre_passage_semaine': c['nbre_passage_semaine'],
+        'jour_fixe': c['jour_fixe'],
+    } for i, c in enumerate(clients)])
+    # Les distances routières ne sont pas calculées pendant le benchmark
+    cr.execute("DELETE FROM collecte_distance_job WHERE partner_id IN %s", (tuple(partners.ids),))
+    return partners
+
+
+def monthly_quality(planning, partners, jours):
+    lines = planning.line_ids
+    tours = {}
+    for line in lines.sorted(lambda l: (l.date, l.tournee, l.sequence)):
+        tours.setdefault((line.date, line.tournee), []).append(
+            (line.partner_id.latitude, line.partner_id.longitude))
+    mask = collection_mask(jours, [(p.jour_fixe, p.nbre_passage_semaine, p.frequence_collecte) for p in partners])
+    planned = {(line.date, line.partner_id.id) for line in lines}
+    due = {(jour, p.id) for jour, row in zip(jours, mask) for p, is_due in zip(partners, row) if is_due}
+    per_day = Counter(day for day, _ in tours)
+    return {
+        'km': round(sum(path_km(stops) for stops in tours.values()), 1),
+        'tours': len(tours),
+        'max_vehicles_per_day': max(per_day.values(), default=0),
+        'unserved_stops': len(due - planned),
+        'lines': len(lines),
+    }
+
+
+def run_size(size):
+    partners = setup_clients(size)
+    today = date.today()
+    jours = planning_days(today.year, today.month)
+    planning = env['collecte.planning_mensuel'].create({
+        'name': f'Bench {size}', 'mois': str(today.month), 'annee': today.year,
+        'capacite_journaliere': CAPACITY,
+    })
+    # Le planning journalier doit retrouver ce planning pour le mois
+    cr.execute("UPDATE collecte_planning_mensuel SET state = 'draft' WHERE id != %s AND annee = %s AND mois = %s",
+               (planning.id, today.year, str(today.month)))
+    planning.write({'generation_state': 'queued', 'generation_scope': 'full'})
+    _, monthly = measure(lambda: planning._run_generation(commit=False))
+    monthly['solve_s'] = round(planning.generation_seconds, 2)
+    monthly.update(monthly_quality(planning, partners, jours))
+
+    busiest = Counter(planning.line_ids.mapped('date')).most_common(1)
+    daily = {'date': None}
+    if busiest:
+        day, expected = busiest[0]
+        Daily = env['collecte.planning_journalier']
+        tours, daily = measure(lambda: Daily.generate_for_date(day))
+        served = tours.ligne_ids
+        daily.update({
+            'date': day.isoformat(),
+            'km': round(sum(path_km([(l.latitude, l.longitude) for l in t.ligne_ids.sorted('ordre')])
+                            for t in tours), 1),
+            'vehicles_used': len(tours),
+            'unserved_stops': expected - len(served),
+        })
+    return {'clients': size, 'monthly': monthly, 'daily': daily}
+
+
+ICP = env['ir.config_parameter'].sudo()
+for key, var in (('collecte.planning_solution_limit', 'SOLUTION_LIMIT'), ('collecte.planning_solver_workers', 'WORKERS')):
+    if os.environ.get(var):
+        ICP.set_param(key, os.environ[var])
+# Pas de re-planification automatique déclenchée par les clients créés
+ICP.set_param('collecte.planning_auto_replan', '0')
+
+results = []
+for size in SIZES:
+    with cr.savepoint(flush=False) as savepoint:
+        setup_fleet()
+        row = run_size(size)
+        savepoint.rollback()
+    env.invalidate_all()
+    results.append(row)
+    m, d = row['monthly'], row['daily']
+    print(f"{size:>6} clients | monthly {m['wall_s']:>8} s, {m['queries']:>7} q, {m['peak_mb']:>7} MB, "
+          f"{m['km']:>9} km, {m['unserved_stops']} unserved | daily {d.get('wall_s', '-')} s, "
+          f"{d.get('vehicles_used', '-')} vehicles, {d.get('unserved_stops', '-')} unserved")
+cr.rollback()
+
+with open(OUTPUT, 'w') as f:
+    json.dump({
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'vehicles': VEHICLES,
+        'capacity_kg': CAPACITY,
+        'results': results,
+    }, f, indent=2)
+print(f"Results written to {OUTPUT}")
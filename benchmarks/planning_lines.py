@@ -0,0 +1,64 @@
+"""Insertion of generated planning lines: ORM commands against the bulk path.
+
+Runs inside an Odoo shell and rolls everything back::
+
+    odoo-bin shell -d <db> --no-http < benchmarks/planning_lines.py
+
+Set ``LINES`` in the environment to change the volume (default 10000).
+For each path, reports the wall time and the SQL query count of inserting
+the lines of a month, then of replacing them.
+"""
+import os
+import time
+from datetime import date, datetime, timedelta
+
+LINES = int(os.environ.get('LINES', 10000))
+
+
+def measure(label, func):
+    env.flush_all()  # noqa: F821 - fourni par odoo-bin shell
+    queries = env.cr.sql_log_count  # noqa: F821
+    started = time.perf_counter()
+    func()
+    env.flush_all()  # noqa: F821
+    print(f"{label:<32} {time.perf_counter() - started:>8.2f} s {env.cr.sql_log_count - queries:>8} queries")  # noqa: F821
+
+
+def line_values(planning, partners):
+    day = date.today().replace(day=1)
+    for i in range(LINES):
+        jour = day + timedelta(days=i % 26)
+        arrival = datetime.combine(jour, datetime.min.time()) + timedelta(hours=8, minutes=i % 480)
+        yield {
+            'planning_id': planning.id,
+            'date': jour,
+            'partner_id': partners[i % len(partners)].id,
+            'quantite': 10.0 + i % 50,
+            'arrival_dt': arrival,
+            'depart_dt': arrival + timedelta(minutes=10),
+            'tournee': 1 + i % 3,
+            'sequence': 1 + i // 3,
+        }
+
+
+with env.cr.savepoint(flush=False) as savepoint:  # noqa: F821
+    Partner = env['res.partner']  # noqa: F821
+    Planning = env['collecte.planning_mensuel']  # noqa: F821
+    Line = env['collecte.planning_ligne']  # noqa: F821
+    partners = Partner.with_context(tracking_disable=True).create([
+        {'name': f'Bench {i}', 'type_contrat': 'passage', 'frequence_collecte': '7', 'zone': 'tunis'}
+        for i in range(200)
+    ])
+    mois = str(date.today().month)
+    orm = Planning.create({'name': 'Bench ORM', 'mois': mois})
+    bulk = Planning.create({'name': 'Bench bulk', 'mois': mois})
+    print(f"{LINES} lines")
+
+    measure("ORM (0, 0, vals) create", lambda: orm.write({
+        'line_ids': [(0, 0, vals) for vals in line_values(orm, partners)]}))
+    measure("ORM unlink", lambda: orm.line_ids.unlink())
+
+    measure("bulk create", lambda: Line._bulk_create(list(line_values(bulk, partners))))
+    measure("bulk delete", lambda: Line._bulk_delete(bulk.ids))
+
+    savepoint.rollback()
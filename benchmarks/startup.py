@@ -0,0 +1,73 @@
+"""Import cost of the addon for a worker that never plans.
+
+Each scenario runs in a fresh interpreter and reports the wall time of the
+import and the peak RSS of the process:
+
+* ``python`` - empty interpreter, for reference;
+* ``addon`` - ``import odoo.addons.collecte_module`` as a worker does at
+  boot, with the planning dependencies left unloaded;
+* ``addon+planner`` - the same followed by ``tools.lazy.preload()``, i.e.
+  what a worker pays once it has planned.
+
+Before lazy loading, every worker paid for NumPy, scikit-learn, OR-Tools
+and the sentence-transformers model at boot; run the script on that
+revision to compare.
+
+Usage::
+
+    python benchmarks/startup.py --addons-path /path/to/odoo/addons,/path/to/custom [--runs 5]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+SNIPPET = """
+import json, resource, time
+started = time.perf_counter()
+{setup}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+ADDON_SETUP = """
+import odoo
+odoo.tools.config.parse_config(['--addons-path', {addons_path!r}])
+import odoo.addons.collecte_module
+"""
+
+SCENARIOS = {
+    'python': "pass",
+    'addon': ADDON_SETUP,
+    'addon+planner': ADDON_SETUP + "from odoo.addons.collecte_module.tools import lazy\nlazy.preload()\n",
+}
+
+
+def run(setup, runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', SNIPPET.format(setup=setup)],
+                             check=True, capture_output=True, text=True).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    return {
+        'seconds': round(statistics.median(s['seconds'] for s in samples), 3),
+        'max_rss_mb': round(statistics.median(s['max_rss_mb'] for s in samples), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--addons-path', required=True)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    results = {}
+    for name, setup in SCENARIOS.items():
+        results[name] = run(setup.format(addons_path=args.addons_path), args.runs)
+        print(f"{name:<15} {results[name]['seconds']:>8.3f} s {results[name]['max_rss_mb']:>9.1f} MB")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
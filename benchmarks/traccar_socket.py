@@ -0,0 +1,96 @@
+"""Traccar socket consumer against a local fake server, without Odoo.
+
+Runs ``tools/traccar_socket.py`` against the WebSocket endpoint of
+:class:`_fake_traccar.FakeTraccar` and checks that:
+
+* pushed positions are batched, one entry per device, into ``flush``;
+* after a server restart (sockets closed, sessions forgotten) the consumer
+  logs in again, reconnects with the new session cookie and keeps
+  receiving positions;
+* a connection refused while the server is down is retried with backoff;
+* :meth:`stop` ends :meth:`run` and flushes what was buffered.
+
+Usage::
+
+    python benchmarks/traccar_socket.py
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import load_tools  # noqa: E402
+from _fake_traccar import FakeTraccar  # noqa: E402
+
+load_tools()
+from collecte_tools.http_client import ServiceClient  # noqa: E402
+from collecte_tools.traccar_socket import TraccarSocketConsumer  # noqa: E402
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def main():
+    fake = FakeTraccar(devices=200)
+    client = ServiceClient('traccar', fake.start(), auth=('bench', 'bench'), timeout=5.0, retries=0)
+    batches = []
+    consumer = TraccarSocketConsumer(client, batches.append, batch_window=0.1, max_backoff=1.0)
+    thread = threading.Thread(target=consumer.run, daemon=True)
+    thread.start()
+    failures = []
+
+    def check(name, ok):
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+        if not ok:
+            failures.append(name)
+
+    def flushed():
+        return sum(len(batch) for batch in batches)
+
+    # 1) Connexion, puis deux ticks poussés dans la même fenêtre : une entrée par appareil
+    check("connected", wait_for(lambda: fake.connected() == 1))
+    fake.tick()
+    fake.push(list(fake.positions.values()))
+    fake.tick()
+    fake.push(list(fake.positions.values()))
+    check("200 devices flushed once each", wait_for(lambda: flushed() >= 200) and flushed() == 200)
+    check("latest fix kept per device",
+          {p['id'] for batch in batches for p in batch} == {p['id'] for p in fake.positions.values()})
+
+    # 2) Redémarrage du serveur : nouvelle session, nouvelle socket, réception reprise
+    fake.restart()
+    check("reconnected after restart", wait_for(lambda: fake.connected() == 1))
+    check("logged in again", fake.logins == 2)
+    check("new session cookie used", fake.socket_cookies[-1] == 'fake2' and fake.rejected_sockets == 0)
+    before = flushed()
+    fake.tick()
+    fake.push(list(fake.positions.values()))
+    check("positions received after reconnect", wait_for(lambda: flushed() >= before + 200))
+
+    # 3) Serveur indisponible : les connexions échouent et sont retentées
+    reconnects = consumer.stats['reconnects']
+    fake.fail_next = 3
+    fake.restart()
+    check("reconnected after 3 failed logins", wait_for(lambda: fake.connected() == 1, timeout=15.0))
+    check("backoff retries counted", consumer.stats['reconnects'] >= reconnects + 4)
+
+    # 4) Arrêt : run() se termine
+    consumer.stop()
+    thread.join(timeout=5.0)
+    check("run() returned after stop()", not thread.is_alive())
+
+    fake.stop()
+    print(f"stats: {consumer.stats}, logins: {fake.logins}")
+    print("All checks passed" if not failures else "FAILED: " + '; '.join(failures))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
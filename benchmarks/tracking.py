@@ -0,0 +1,85 @@
+"""Position ingestion from a fake Traccar server, for a large fleet.
+
+Runs inside an Odoo shell, from the addon directory, and rolls everything
+back::
+
+    odoo-bin shell -d <db> --no-http < benchmarks/tracking.py
+
+Starts :class:`_fake_traccar.FakeTraccar` on a local port and points the
+``traccar`` service at it. Creates ``DEVICES`` vehicles (existing ones are
+archived for the run), then runs ``update_tracking_info`` once per tick.
+Each tick resends, stalls, moves or drops the ``fixTime`` of every device.
+Per tick it records wall time and SQL queries, and checks that:
+
+* ``applied`` / ``moved`` match what the fake server changed;
+* every vehicle has a live row and none lost its ``last_fix_time``;
+* a position without ``fixTime`` kept the previous watermark.
+
+Environment variables: ``DEVICES`` (default 2000), ``TICKS`` (default 5).
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.getcwd(), 'benchmarks'))
+from _fake_traccar import FakeTraccar  # noqa: E402
+
+DEVICES = int(os.environ.get('DEVICES', 2000))
+TICKS = int(os.environ.get('TICKS', 5))
+
+env = env  # noqa: F821 - fourni par odoo-bin shell
+cr = env.cr
+
+
+def setup_fleet():
+    cr.execute("UPDATE fleet_vehicle SET active = false")
+    brand = env['fleet.vehicle.model.brand'].create({'name': 'Bench'})
+    model = env['fleet.vehicle.model'].create({'name': 'Bench truck', 'brand_id': brand.id})
+    return env['fleet.vehicle'].create([
+        {'model_id': model.id, 'license_plate': f'BENCH-{i}', 'traccar_device_id': str(i)}
+        for i in range(1, DEVICES + 1)
+    ])
+
+
+def watermarks(vehicles):
+    cr.execute("SELECT vehicle_id, last_fix_time FROM collecte_vehicle_live WHERE vehicle_id IN %s",
+               (tuple(vehicles.ids),))
+    return dict(cr.fetchall())
+
+
+fake = FakeTraccar(devices=DEVICES)
+ICP = env['ir.config_parameter'].sudo()
+failures = []
+with cr.savepoint(flush=False) as savepoint:
+    ICP.set_param('collecte.traccar_url', fake.start())
+    ICP.set_param('collecte.tracking_history_backfill', '0')
+    vehicles = setup_fleet()
+    by_device = {v.traccar_device_id: v.id for v in vehicles}
+    for tick in range(1, TICKS + 1):
+        before = watermarks(vehicles)
+        expected = fake.tick()
+        no_fix = [by_device[str(device_id)] for device_id in expected['no_fix_time']]
+        env.flush_all()
+        queries = cr.sql_log_count
+        started = time.perf_counter()
+        stats = env['fleet.vehicle'].update_tracking_info()
+        wall = time.perf_counter() - started
+        after = watermarks(vehicles)
+
+        checks = {
+            'applied': stats['applied'] == expected['applied'],
+            'moved': stats['moved'] == expected['moved'],
+            'live_rows': len(after) == DEVICES,
+            'no_null_fix': all(after.values()),
+            'watermark_kept': all(after[v] == before.get(v) for v in no_fix),
+        }
+        failures += [f'tick {tick}: {name}' for name, ok in checks.items() if not ok]
+        print(f"tick {tick}: {stats['received']:>5} received, {stats['applied']:>5} applied "
+              f"(expected {expected['applied']}), {stats['moved']:>5} moved "
+              f"(expected {expected['moved']}), {len(no_fix)} without fixTime | "
+              f"{wall:.2f} s, {cr.sql_log_count - queries} queries")
+    savepoint.rollback()
+fake.stop()
+cr.rollback()
+
+print("All checks passed" if not failures else "FAILED: " + ', '.join(failures))
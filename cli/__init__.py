@@ -0,0 +1 @@
+from . import traccar_socket
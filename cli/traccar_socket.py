@@ -0,0 +1,58 @@
+"""``odoo-bin --addons-path=<paths> traccarsocket -c odoo.conf -d <db>``
+
+``--addons-path`` must come first: Odoo only discovers addon commands
+when it is the first argument.
+
+Long-running worker that applies Traccar positions as they are pushed on
+``/api/socket``, instead of waiting for the 5 minute polling cron.
+"""
+import argparse
+import logging
+import signal
+
+import odoo
+from odoo.cli import Command
+
+from ..tools.http_client import get_client
+from ..tools.traccar_socket import TraccarSocketConsumer
+
+_logger = logging.getLogger(__name__)
+
+
+class TraccarSocket(Command):
+    """Consume the Traccar position stream and write it in batches"""
+
+    def run(self, args):
+        parser = argparse.ArgumentParser(prog='odoo-bin traccarsocket', description=self.__doc__)
+        parser.add_argument('--window', type=float, default=0.3,
+                            help="Batching window in seconds (default: 0.3)")
+        parser.add_argument('--url', help="Override collecte.traccar_url (e.g. a local fake server)")
+        opts, odoo_args = parser.parse_known_args(args)
+
+        odoo.tools.config.parse_config(odoo_args)
+        dbname = odoo.tools.config['db_name']
+        if not dbname:
+            parser.error("a database is required (-d)")
+        registry = odoo.modules.registry.Registry(dbname)
+
+        with registry.cursor() as cr:
+            client = get_client(odoo.api.Environment(cr, odoo.SUPERUSER_ID, {}), 'traccar')
+        if opts.url:
+            client.base_url = opts.url.rstrip('/')
+
+        def flush(positions):
+            # Un curseur et un commit par lot
+            with registry.cursor() as cr:
+                env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+                applied, changed = env['fleet.vehicle']._apply_traccar_positions(positions)
+            _logger.debug("[SOCKET] %s/%s position(s) applied (%s moved)", applied, len(positions), len(changed))
+
+        consumer = TraccarSocketConsumer(client, flush, batch_window=opts.window)
+
+        def _stop(signum, frame):
+            consumer.stop()
+        signal.signal(signal.SIGTERM, _stop)
+        signal.signal(signal.SIGINT, _stop)
+
+        consumer.run()
+        _logger.info("[SOCKET] Stopped: %s", consumer.stats)
@@ -1,2 +1,4 @@
 from . import partner_location_controller
-from . import auth_controller
\ No newline at end of file
+from . import auth_controller
+from . import vehicle_tracking_controller
+from . import http_stats_controller
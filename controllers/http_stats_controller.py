@@ -0,0 +1,15 @@
+from odoo import http
+from odoo.exceptions import AccessDenied
+from odoo.http import request
+
+from ..tools.http_client import get_stats
+
+
+class HttpStatsController(http.Controller):
+
+    @http.route('/get_outbound_http_stats', type='json', auth='user')
+    def get_outbound_http_stats(self):
+        if not request.env.user.has_group('base.group_system'):
+            raise AccessDenied()
+        # Compteurs du worker qui répond (un jeu de compteurs par processus)
+        return get_stats()
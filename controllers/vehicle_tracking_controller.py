@@ -0,0 +1,54 @@
+import threading
+import time
+from datetime import datetime
+from odoo import fields, http
+from odoo.http import request
+
+# Cache partagé par tous les onglets servis par ce worker, une entrée par base
+FLEET_CACHE_TTL = 5.0
+_fleet_cache = {}
+_fleet_cache_lock = threading.Lock()
+
+
+def _get_fleet_snapshot(env):
+    # Un seul rafraîchissement par tick, quel que soit le nombre de lecteurs
+    with _fleet_cache_lock:
+        cache = _fleet_cache.setdefault(env.cr.dbname, {'loaded_at': 0.0, 'positions': [], 'cursor': None})
+        if time.monotonic() - cache['loaded_at'] >= FLEET_CACHE_TTL:
+            cache['positions'], cache['cursor'] = env['fleet.vehicle'].sudo()._read_fleet_positions()
+            cache['loaded_at'] = time.monotonic()
+        return cache['positions'], cache['cursor']
+
+
+class VehicleTrackingController(http.Controller):
+
+    @http.route('/get_vehicle_track_history', type='json', auth='user')
+    def get_vehicle_track_history(self, vehicle_id, date_from, date_to, zoom=13):
+        vehicle = request.env['fleet.vehicle'].browse(int(vehicle_id))
+        if not vehicle.exists():
+            return {'status': 'error', 'message': 'Vehicle not found'}
+        if not date_from or not date_to:
+            return {'status': 'error', 'message': 'Period is required'}
+        # Lecture depuis l'historique local, sans appel à l'API Traccar
+        track = request.env['collecte.vehicle.position'].get_simplified_track(
+            vehicle.id,
+            datetime.fromisoformat(date_from),
+            datetime.fromisoformat(date_to),
+            zoom=int(zoom or 13),
+        )
+        return dict(track, status='success')
+
+    @http.route('/get_fleet_positions', type='json', auth='user')
+    def get_fleet_positions(self, cursor=None, device_ids=None):
+        positions, snapshot_cursor = _get_fleet_snapshot(request.env)
+        # Curseur = transaction (xmin de l'instantané lu) : aucune écriture validée
+        # dans le désordre n'est perdue ; un ancien curseur daté renvoie tout
+        if isinstance(cursor, int):
+            positions = [p for p in positions if p['txid'] >= cursor]
+        if device_ids:
+            wanted = {str(d) for d in device_ids}
+            positions = [p for p in positions if p['device_id'] in wanted]
+        return {
+            'cursor': snapshot_cursor,
+            'positions': [dict(p, updated_at=fields.Datetime.to_string(p['updated_at'])) for p in positions],
+        }
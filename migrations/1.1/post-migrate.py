@@ -0,0 +1,27 @@
+# Colonnes de fleet_vehicle devenues des champs calculés (lus dans collecte_vehicle_live)
+OLD_COLUMNS = (
+    'traccar_status', 'traccar_position_id', 'traccar_latitude', 'traccar_longitude',
+    'traccar_altitude', 'traccar_speed', 'traccar_accuracy',
+)
+
+
+def migrate(cr, version):
+    # La télémétrie courante quitte fleet_vehicle pour collecte_vehicle_live
+    cr.execute("""
+        SELECT column_name FROM information_schema.columns
+         WHERE table_name = 'fleet_vehicle' AND column_name = 'traccar_latitude'
+    """)
+    if not cr.fetchone():
+        return
+    cr.execute("""
+        INSERT INTO collecte_vehicle_live
+               (vehicle_id, position_id, latitude, longitude, altitude, speed, accuracy, status, updated_at)
+        SELECT id, traccar_position_id, traccar_latitude, traccar_longitude, traccar_altitude,
+               traccar_speed, traccar_accuracy, traccar_status, (now() at time zone 'UTC')
+          FROM fleet_vehicle
+         WHERE traccar_device_id IS NOT NULL AND traccar_device_id != ''
+        ON CONFLICT (vehicle_id) DO NOTHING
+    """)
+    # Copie faite : l'ORM ne supprime pas les colonnes des champs devenus non stockés
+    cr.execute("ALTER TABLE fleet_vehicle {}".format(
+        ', '.join(f'DROP COLUMN IF EXISTS {column}' for column in OLD_COLUMNS)))
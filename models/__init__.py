@@ -1,9 +1,14 @@
 from . import collect_vehicle
+from . import collect_vehicle_position
+from . import collect_vehicle_live
 from . import collect_client
+from . import collecte_distance_cache
+from . import collecte_distance_job
 from . import collect_bordereau
 from . import conteneur_ligne
 from . import collecteur_ligne
 from . import collect_convoyeur
 from . import convoyeur_token
 from . import collecte_planning_mensuel
-from . import collecte_planning_jour
\ No newline at end of file
+from . import collecte_planning_jour
+from . import collecte_planning_run
@@ -1,8 +1,20 @@
 from odoo import models, fields, api
-import requests
+import json
 import logging
+import statistics
+from collections import defaultdict
+
+from ..tools.routing import get_depot, get_routing_service, haversine_km
+from ..tools.schedule import collection_mask, planning_days
+
 _logger = logging.getLogger(__name__)
 
+# Champs dont dépend le planning mensuel : leur modification rend des jours obsolètes
+PLANNING_FIELDS = {
+    'jour_fixe', 'nbre_passage_semaine', 'frequence_collecte',
+    'latitude', 'longitude', 'quantite_estimee', 'active',
+}
+
 class ResPartner(models.Model):
     _inherit = 'res.partner'
 
@@ -41,10 +53,14 @@ class ResPartner(models.Model):
     ], string='Gouvernorat', index=True, tracking=True, help="Gouvernorat (zone) du partenaire")
     distance_from_origin = fields.Float(
         string="Distance routière (km)",
-        compute="_calculate_distance",
-            store=True,
-
+        readonly=True,
+        help="Calculée en arrière-plan après chaque changement de coordonnées."
     )
+    distance_state = fields.Selection([
+        ('pending', 'En attente'),
+        ('done', 'Calculée'),
+        ('failed', 'Échec'),
+    ], string="État du calcul de distance", readonly=True, copy=False)
     type_contrat = fields.Selection([
         ('passage', 'Par Passage'),
         ('quantite', 'Par Quantité'),
@@ -153,6 +169,38 @@ class ResPartner(models.Model):
         tracking=True,
         help="Jour fixe de collecte "
     )
+    jours_collecte_preview = fields.Char(
+        string="Jours de collecte (mois en cours)",
+        compute='_compute_jours_collecte_preview',
+        help="Jours où le client sera planifié ce mois-ci, d'après sa fréquence, "
+             "ses passages par semaine et son jour fixe."
+    )
+
+    @api.depends('jour_fixe', 'nbre_passage_semaine', 'frequence_collecte')
+    def _compute_jours_collecte_preview(self):
+        today = fields.Date.context_today(self)
+        days = planning_days(today.year, today.month)
+        mask = collection_mask(days, [
+            (p.jour_fixe, p.nbre_passage_semaine, p.frequence_collecte) for p in self])
+        for col, partner in enumerate(self):
+            due = [d.strftime('%d/%m') for d, is_due in zip(days, mask[:, col]) if is_due]
+            partner.jours_collecte_preview = ', '.join(due) or False
+
+    def _collection_calendar(self, days):
+        """Due collections of these partners as a ``days x partners`` boolean array.
+
+        Columns follow ``self.ids``; the schedule fields are read in one query.
+        """
+        if not self:
+            return collection_mask(days, [])
+        self.flush_model(['jour_fixe', 'nbre_passage_semaine', 'frequence_collecte'])
+        self.env.cr.execute("""
+            SELECT id, jour_fixe, nbre_passage_semaine, frequence_collecte
+              FROM res_partner WHERE id IN %s
+        """, (tuple(self.ids),))
+        schedules = {row[0]: row[1:] for row in self.env.cr.fetchall()}
+        return collection_mask(days, [schedules[pid] for pid in self.ids])
+
     @api.depends('quantite_estimee', 'frequence_collecte', 'nbre_passage_semaine')
     def _compute_quantite_previsionnelle(self):
         for record in self:
@@ -185,80 +233,104 @@ class ResPartner(models.Model):
         for record in self:
             record._compute_quantite_previsionnelle()
 
-    # Your origin coordinates:
-    ORIGIN_LAT = 36.37065151015154
-    ORIGIN_LON = 9.111696141592383
-    ORS_API_KEY = "eyJvcmciOiI1YjNjZTM1OTc4NTExMTAwMDFjZjYyNDgiLCJpZCI6IjMxMzdlMmE5MjRlZjQ2OWFiN2QzYzM0OWM1ZjBmOWIzIiwiaCI6Im11cm11cjY0In0="
-    @api.depends('latitude', 'longitude')
     def _calculate_distance(self):
-        origin_lat = self.ORIGIN_LAT
-        origin_lon = self.ORIGIN_LON
-
-        url = "https://api.openrouteservice.org/v2/matrix/driving-car"
-        headers = {
-            'Authorization': self.ORS_API_KEY,
-            'Content-Type': 'application/json'
-        }
+        """Road distance (km) from the depot to each partner, as ``{partner_id: km}``.
 
-        valid_partners = self.filtered(lambda p: p.latitude and p.longitude)
-        if not valid_partners:
-            for partner in self:
-                partner.distance_from_origin = 0.0
-            return
+        Cached distances are reused; the others are asked to the configured
+        routing provider (ORS by default), in chunked matrix requests.
+        Partners without coordinates, or whose lookup failed, are left out.
+        """
+        origin = get_depot(self.env)
 
-        destinations = []
-        partner_map = {}
-        for idx, partner in enumerate(valid_partners):
+        points = {}
+        for partner in self:
+            if not (partner.latitude and partner.longitude):
+                continue
             try:
                 lat = float(str(partner.latitude).replace(',', '.'))
                 lon = float(str(partner.longitude).replace(',', '.'))
-                destinations.append([lon, lat])
-                partner_map[idx] = partner
+                points[partner.id] = (lat, lon)
             except Exception as e:
                 _logger.error(f"[DISTANCE] Failed to parse coordinates for {partner.name}: {e}")
-                partner.distance_from_origin = 0.0
-
-        payload = {
-            "locations": [[origin_lon, origin_lat]] + destinations,
-            "sources": [0],
-            "destinations": list(range(1, len(destinations) + 1)),
-            "metrics": ["distance"],
-            "units": "km"
+        if not points:
+            return {}
+
+        routing = get_routing_service(self.env, purpose='partner')
+        distances = routing.one_to_many(origin, list(points.values()))
+        result = {
+            partner_id: round(dist, 2)
+            for partner_id, dist in zip(points, distances)
+            if dist is not None
         }
-
-        try:
-            _logger.info(f"[DISTANCE] Sending matrix payload to ORS API: {payload}")
-            response = requests.post(url, json=payload, headers=headers, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-            distances = data.get("distances", [[]])[0]
-
-            for i, dist in enumerate(distances):
-                partner = partner_map.get(i)
-                if partner:
-                    partner.distance_from_origin = round(dist, 2)
-                    _logger.info(f"[DISTANCE] Distance to {partner.name}: {dist:.2f} km")
-
-        except Exception as e:
-            _logger.error(f"[DISTANCE] Matrix API call failed: {str(e)}", exc_info=True)
-            for partner in valid_partners:
-                partner.distance_from_origin = 0.0
+        _logger.info(f"[DISTANCE] {len(result)}/{len(points)} distance(s) resolved ({routing.used_label})")
+        return result
+
+    @api.model
+    def calibrate_detour_factors(self, min_samples=3):
+        """Calibrate the per-governorate haversine detour factors.
+
+        The factor of a zone is the median ratio between the road distance
+        and the great-circle distance from the depot, over the partners whose
+        road distance is known. Stored in ``collecte.detour_factors``.
+        """
+        depot = get_depot(self.env)
+        partners = self.search([
+            ('distance_state', '=', 'done'), ('distance_from_origin', '>', 0), ('zone', '!=', False),
+        ])
+        ratios = defaultdict(list)
+        for partner in partners:
+            straight = haversine_km(depot, (partner.latitude, partner.longitude))
+            if straight > 1.0:
+                ratios[partner.zone].append(partner.distance_from_origin / straight)
+        factors = {}
+        for zone, values in ratios.items():
+            if len(values) >= min_samples:
+                factors[zone] = round(statistics.median(values), 3)
+        self.env['ir.config_parameter'].sudo().set_param('collecte.detour_factors', json.dumps(factors))
+        _logger.info(f"[DISTANCE] Detour factors calibrated: {factors}")
+        return factors
+
+    def _write_distances(self, distances):
+        """Store ``{partner_id: km}`` in one UPDATE, marking them computed."""
+        if not distances:
+            return
+        self.env.cr.execute(f"""
+            UPDATE res_partner AS p
+               SET distance_from_origin = d.km, distance_state = 'done'
+              FROM (VALUES {', '.join(['(%s, %s::float8)'] * len(distances))}) AS d(id, km)
+             WHERE p.id = d.id
+        """, [value for item in distances.items() for value in item])
+        self.invalidate_model(['distance_from_origin', 'distance_state'])
+
+    def _enqueue_distance_jobs(self):
+        partners = self.filtered(lambda p: p.latitude and p.longitude)
+        if not partners:
+            return
+        self.env['collecte.distance.job']._enqueue(partners.ids)
+        self.env.cr.execute(
+            "UPDATE res_partner SET distance_state = 'pending' WHERE id IN %s", (tuple(partners.ids),))
+        self.invalidate_model(['distance_state'])
 
     @api.model_create_multi
     def create(self, vals_list):
         partners = super().create(vals_list)
-        for partner in partners:
-            partner._calculate_distance()
+        # Calcul en arrière-plan : la sauvegarde n'attend pas ORS
+        partners._enqueue_distance_jobs()
+        self.env['collecte.planning_mensuel']._mark_stale_days(partners)
         return partners
 
     def write(self, vals):
+        if PLANNING_FIELDS.intersection(vals):
+            # Jours où le client figurait avant la modification
+            self.env['collecte.planning_mensuel']._mark_stale_days(self)
         res = super().write(vals)
         if 'latitude' in vals or 'longitude' in vals:
-            for partner in self:
-                partner._calculate_distance()
+            self._enqueue_distance_jobs()
+        if PLANNING_FIELDS.intersection(vals):
+            # Jours où il doit figurer désormais
+            self.env['collecte.planning_mensuel']._mark_stale_days(self)
         return res
-        
-    
+
     def action_get_geolocation(self):
         self.ensure_one()
         return {
@@ -1,8 +1,16 @@
 from odoo import api, models, fields
-import requests
+import logging
 import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 
+from ..tools.http_client import get_client
+from .collect_vehicle_live import LIVE_COLUMNS
+
+_logger = logging.getLogger(__name__)
+
+
 class CollectVehicle(models.Model):
     _inherit = 'fleet.vehicle'
 
@@ -15,20 +23,37 @@ class CollectVehicle(models.Model):
 
     traccar_device_id = fields.Char(string='Traccar Device ID', required=False)
     traccar_name = fields.Char(string='Device Name')
-    traccar_status = fields.Char(string='Status')
     traccar_unique_id = fields.Char(string='Unique ID')
-    traccar_position_id = fields.Char(string='Position ID')
-
     traccar_driver_name = fields.Char(string='Driver Name')
-    traccar_latitude = fields.Float()
-    traccar_longitude = fields.Float()
-    traccar_altitude = fields.Float()
-    traccar_speed = fields.Float()
-    traccar_accuracy = fields.Float()
+
+    # Télémétrie courante : lue depuis collecte.vehicle.live pour ne pas
+    # verrouiller la ligne fleet.vehicle à chaque mise à jour de position
+    traccar_live_ids = fields.One2many('collecte.vehicle.live', 'vehicle_id')
+    traccar_status = fields.Char(string='Status', compute='_compute_traccar_live')
+    traccar_position_id = fields.Char(string='Position ID', compute='_compute_traccar_live')
+    traccar_last_fix_time = fields.Datetime(string='Last Fix Time', compute='_compute_traccar_live')
+    traccar_latitude = fields.Float(compute='_compute_traccar_live')
+    traccar_longitude = fields.Float(compute='_compute_traccar_live')
+    traccar_altitude = fields.Float(compute='_compute_traccar_live')
+    traccar_speed = fields.Float(compute='_compute_traccar_live')
+    traccar_accuracy = fields.Float(compute='_compute_traccar_live')
     traccar_distance = fields.Float(string='Distance (last trip)', digits=(6, 2))
     traccar_total_distance = fields.Float(string='Total Distance', digits=(10, 2))
 
 
+    @api.depends('traccar_live_ids')
+    def _compute_traccar_live(self):
+        for vehicle in self:
+            live = vehicle.traccar_live_ids[:1]
+            vehicle.traccar_status = live.status
+            vehicle.traccar_position_id = live.position_id
+            vehicle.traccar_last_fix_time = live.last_fix_time
+            vehicle.traccar_latitude = live.latitude
+            vehicle.traccar_longitude = live.longitude
+            vehicle.traccar_altitude = live.altitude
+            vehicle.traccar_speed = live.speed
+            vehicle.traccar_accuracy = live.accuracy
+
     @api.onchange('traccar_unique_id')
     def _onchange_generate_unique_id(self):
         if not self.traccar_unique_id:
@@ -48,24 +73,160 @@ class CollectVehicle(models.Model):
             self.traccar_unique_id = new_unique_id
 
     def update_tracking_info(self):
-        url = "https://demo4.traccar.org/api/positions"
-        auth = ('pprologic138@gmail.com', 'oumaima123@')
+        client = get_client(self.env, 'traccar')
 
+        started = time.monotonic()
         try:
-            response = requests.get(url, auth=auth)
-            response.raise_for_status()
-            positions = response.json()
-            for position in positions:
-                vehicle = self.search([('traccar_device_id', '=', str(position['deviceId']))], limit=1)
-                if vehicle:
-                    vehicle.write({
-                        'traccar_latitude': position.get('latitude'),
-                        'traccar_longitude': position.get('longitude'),
-                        'traccar_speed': position.get('speed'),
-                    })
+            positions = client.get_json('/api/positions')
         except Exception as e:
             raise Exception(f"Error while updating tracking info: {e}")
 
+        applied, changed = self._apply_traccar_positions(positions)
+
+        ICP = self.env['ir.config_parameter'].sudo()
+        backfilled = 0
+        if ICP.get_param('collecte.tracking_history_backfill') in ('1', 'True', 'true'):
+            backfilled = self._backfill_traccar_history(changed, client)
+
+        duration = time.monotonic() - started
+        _logger.info("[TRACKING] %s/%s position(s) applied (%s moved), %s history fix(es) backfilled in %.2fs",
+                     applied, len(positions), len(changed), backfilled, duration)
+        return {
+            'received': len(positions), 'applied': applied, 'moved': len(changed),
+            'backfilled': backfilled, 'duration': duration,
+        }
+
+    @api.model
+    def _apply_traccar_positions(self, positions):
+        """Apply a Traccar positions snapshot to the matching vehicles.
+
+        The deviceId -> vehicle map is loaded once together with each
+        vehicle's watermark (last position id and fix time applied). Devices
+        whose position did not advance past the watermark are skipped; the
+        others are upserted in batches into ``collecte.vehicle.live``,
+        leaving the tracked fleet.vehicle rows untouched. Fixes of moving
+        vehicles are appended to ``collecte.vehicle.position``; a vehicle
+        that did not move only advances its watermark, and the last fix of
+        the stop is appended when it leaves, so the history keeps both ends
+        of every stop. A position without ``fixTime`` updates the live row
+        but keeps the previous fix time as watermark and is not recorded.
+
+        Returns ``(applied, changed)``: the number of devices upserted, and
+        ``{vehicle_id: (device_id, previous_fix_time, fix_time)}`` for the
+        vehicles that moved.
+        """
+        cr = self.env.cr
+        cr.execute("""
+            SELECT v.id, v.traccar_device_id, l.position_id, l.last_fix_time,
+                   l.latitude, l.longitude, l.speed
+              FROM fleet_vehicle v
+         LEFT JOIN collecte_vehicle_live l ON l.vehicle_id = v.id
+             WHERE v.active AND v.traccar_device_id IS NOT NULL AND v.traccar_device_id != ''
+          ORDER BY v.id
+        """)
+        vehicles_by_device = {}
+        for vehicle_id, device_id, position_id, last_fix, lat, lon, speed in cr.fetchall():
+            # Comme search(limit=1) : le premier véhicule trouvé gagne
+            vehicles_by_device.setdefault(
+                device_id, (vehicle_id, position_id, last_fix, (lat or 0.0, lon or 0.0, speed or 0.0)))
+
+        rows = []
+        changed = {}
+        history = []
+        parse_fix_time = self.env['collecte.vehicle.position'].parse_fix_time
+        for position in positions:
+            device_id = str(position.get('deviceId'))
+            stored = vehicles_by_device.get(device_id)
+            if not stored:
+                continue
+            vehicle_id, last_position_id, last_fix, last_coords = stored
+            position_id = str(position.get('id') or '')
+            fix_time = parse_fix_time(position.get('fixTime'))
+            # Watermark : rien de nouveau depuis le dernier passage
+            if position_id and position_id == last_position_id:
+                continue
+            if fix_time and last_fix and fix_time <= last_fix:
+                continue
+            coords = (
+                position.get('latitude') or 0.0,
+                position.get('longitude') or 0.0,
+                position.get('speed') or 0.0,
+            )
+            # Sans fixTime, le watermark précédent est conservé
+            rows.append((vehicle_id, position_id, fix_time or last_fix) + coords)
+            # Véhicule à l'arrêt : seul le watermark avance
+            if coords == last_coords or not fix_time:
+                continue
+            changed[vehicle_id] = (device_id, last_fix, fix_time)
+            if last_fix:
+                # Dernier fix de l'arrêt (ignoré s'il est déjà dans l'historique)
+                history.append((vehicle_id, last_fix) + last_coords + (0.0,))
+            history.append((vehicle_id, fix_time) + coords + (position.get('course') or 0.0,))
+
+        self.env['collecte.vehicle.live']._upsert(
+            rows, ('position_id', 'last_fix_time', 'latitude', 'longitude', 'speed'))
+        self.env['collecte.vehicle.position']._append_positions(history)
+        return len(rows), changed
+
+    @api.model
+    def _backfill_traccar_history(self, changed, client):
+        """Fetch the fixes between each vehicle's previous watermark and its new fix.
+
+        Only vehicles that advanced during this tick are queried, and only for
+        the positions newer than their watermark.
+        """
+        parse_fix_time = self.env['collecte.vehicle.position'].parse_fix_time
+        history = []
+        for vehicle_id, (device_id, last_fix, fix_time) in changed.items():
+            if not last_fix or not fix_time:
+                continue
+            params = {
+                'deviceId': device_id,
+                'from': last_fix.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                'to': fix_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }
+            try:
+                fixes = client.get_json('/api/positions', params=params)
+            except Exception as e:
+                _logger.warning("[TRACKING] History backfill failed for device %s: %s", device_id, e)
+                continue
+            for position in fixes:
+                history.append((
+                    vehicle_id, parse_fix_time(position.get('fixTime')),
+                    position.get('latitude') or 0.0,
+                    position.get('longitude') or 0.0,
+                    position.get('speed') or 0.0,
+                    position.get('course') or 0.0,
+                ))
+        return self.env['collecte.vehicle.position']._append_positions(history)
+
+    @api.model
+    def _read_fleet_positions(self):
+        """Latest known position of every tracked vehicle, in one query.
+
+        Returns the positions and the cursor of the snapshot they were read
+        from; a position changed later has ``txid`` >= that cursor.
+        """
+        cursor = self.env['collecte.vehicle.live']._snapshot_cursor()
+        self.env.cr.execute("""
+            SELECT v.id, v.name, v.traccar_device_id, l.latitude, l.longitude,
+                   l.speed, l.last_fix_time, l.updated_at, l.write_txid
+              FROM fleet_vehicle v
+              JOIN collecte_vehicle_live l ON l.vehicle_id = v.id
+             WHERE v.active AND v.traccar_device_id IS NOT NULL AND v.traccar_device_id != ''
+        """)
+        return [{
+            'vehicle_id': vehicle_id,
+            'name': name,
+            'device_id': device_id,
+            'latitude': lat,
+            'longitude': lon,
+            'speed': speed,
+            'fix_time': fields.Datetime.to_string(fix_time),
+            'updated_at': updated_at,
+            'txid': txid or 0,
+        } for vehicle_id, name, device_id, lat, lon, speed, fix_time, updated_at, txid in self.env.cr.fetchall()], cursor
+
     @staticmethod
     def compute_device_status(device):
         last_update_str = device.get('lastUpdate')
@@ -91,92 +252,215 @@ class CollectVehicle(models.Model):
             return f"unknown ({str(e)})"
 
     def action_sync_traccar_device(self):
-        self.ensure_one()
+        """Sync the whole recordset with Traccar.
 
-        url = "https://demo4.traccar.org/api/devices"
-        auth = ('pprologic138@gmail.com', 'oumaima123@')
-        headers = {'Content-Type': 'application/json'}
+        The device list and the latest positions are downloaded once, the
+        missing devices are created with a bounded number of concurrent
+        requests, then every vehicle is updated in a single pass. Returns a
+        notification summarizing the result of each vehicle.
+        """
+        client = get_client(self.env, 'traccar')
 
         try:
-            # Step 1: Get all devices
-            response = requests.get(url, auth=auth)
-            response.raise_for_status()
-            devices = response.json()
-
-            # Step 2: Check if device already exists using our uniqueId
-            device = next((d for d in devices if d['uniqueId'] == self.traccar_unique_id), None)
-
-            # Step 3: Create device in Traccar if not exists
-            if not device:
-                if not self.traccar_unique_id:
-                    raise ValueError("Unique ID is required to sync with Traccar.")
-
-                payload = {
-                    "name": self.name,
-                    "uniqueId": self.traccar_unique_id,
-                }
-                create_response = requests.post(url, auth=auth, headers=headers, json=payload)
-                if create_response.status_code in [200, 201]:
-                    device = create_response.json()
-                    self.traccar_device_id = str(device['id'])
-                else:
-                    raise Exception(f"Failed to create device in Traccar. Error: {create_response.text}")
-            else:
-                self.traccar_device_id = str(device['id'])
+            # Step 1: Get all devices and all latest positions, once
+            devices_by_unique_id = {d['uniqueId']: d for d in client.get_json('/api/devices')}
+            positions_by_device = {p['deviceId']: p for p in client.get_json('/api/positions')}
+        except Exception as e:
+            raise Exception(f"Error syncing with Traccar: {str(e)}")
 
-            # Step 4: Fetch device details
-            device_url = f"https://demo4.traccar.org/api/devices/{self.traccar_device_id}"
-            device_response = requests.get(device_url, auth=auth)
-            device_response.raise_for_status()
-            device = device_response.json()
+        errors = {}
+        missing = self.browse()
+        for vehicle in self:
+            if not vehicle.traccar_unique_id:
+                errors[vehicle.id] = "Unique ID is required to sync with Traccar."
+            elif vehicle.traccar_unique_id not in devices_by_unique_id:
+                missing |= vehicle
+
+        # Step 2: Create the missing devices, a few requests at a time
+        if missing:
+            def _create_device(payload):
+                try:
+                    return client.post_json('/api/devices', payload), None
+                except Exception as e:
+                    return None, f"Failed to create device in Traccar. Error: {e}"
+
+            payloads = [{"name": v.name, "uniqueId": v.traccar_unique_id} for v in missing]
+            with ThreadPoolExecutor(max_workers=self._get_traccar_sync_concurrency()) as executor:
+                results = list(executor.map(_create_device, payloads))
+            for vehicle, (device, error) in zip(missing, results):
+                if error:
+                    errors[vehicle.id] = error
+                else:
+                    devices_by_unique_id[vehicle.traccar_unique_id] = device
+
+        # Step 3: Apply every vehicle update in one pass
+        parse_fix_time = self.env['collecte.vehicle.position'].parse_fix_time
+        odometer_readings = []
+        device_rows = []
+        live_rows = []
+        for vehicle in self:
+            if vehicle.id in errors:
+                continue
+            device = devices_by_unique_id[vehicle.traccar_unique_id]
             position_id = device.get('positionId')
+            pos_data = positions_by_device.get(device['id']) if position_id else None
 
-            # Step 5: Fetch latest position
             latitude = longitude = altitude = speed = accuracy = 0.0
             distance = total_distance = 0.0
-
-            if position_id:
-                pos_url = f"https://demo4.traccar.org/api/positions?deviceId={device['id']}"
-                positions = requests.get(pos_url, auth=auth).json()
-                if positions:
-                    pos_data = positions[0]
-                    latitude = pos_data.get('latitude')
-                    longitude = pos_data.get('longitude')
-                    altitude = pos_data.get('altitude')
-                    speed = pos_data.get('speed')
-                    accuracy = pos_data.get('accuracy')
-
-                    attributes = pos_data.get('attributes', {})
-                    distance = round(attributes.get('distance', 0.0) / 1000, 2)
-                    total_distance = round(attributes.get('totalDistance', 0.0) / 1000, 2)
-
-                    odometer_m = attributes.get('odometer')
-                    if odometer_m:
-                        self.env['fleet.vehicle.odometer'].create({
-                            'vehicle_id': self.id,
-                            'value': round(odometer_m / 1000, 2),
-                            'unit': 'kilometers',
-                            'date': fields.Datetime.now(),
-                        })
-
-            # Step 6: Final write (DO NOT overwrite your original unique ID!)
-            self.write({
-                'traccar_name': device.get('name'),
-                'traccar_status': self.compute_device_status(device),
-                'traccar_position_id': str(position_id) if position_id else '',
-                'traccar_driver_name': self.driver_id.name,
-                'traccar_latitude': latitude,
-                'traccar_longitude': longitude,
-                'traccar_altitude': altitude,
-                'traccar_speed': speed,
-                'traccar_accuracy': accuracy,
-                'traccar_distance': distance,
-                'traccar_total_distance': total_distance,
+            fix_time = False
+            if pos_data:
+                latitude = pos_data.get('latitude')
+                longitude = pos_data.get('longitude')
+                altitude = pos_data.get('altitude')
+                speed = pos_data.get('speed')
+                accuracy = pos_data.get('accuracy')
+                fix_time = parse_fix_time(pos_data.get('fixTime')) or False
+
+                attributes = pos_data.get('attributes', {})
+                distance = round(attributes.get('distance', 0.0) / 1000, 2)
+                total_distance = round(attributes.get('totalDistance', 0.0) / 1000, 2)
+
+                odometer_m = attributes.get('odometer')
+                if odometer_m:
+                    odometer_readings.append((vehicle.id, round(odometer_m / 1000, 2)))
+
+            # DO NOT overwrite your original unique ID!
+            device_rows.append((
+                vehicle.id, str(device['id']), device.get('name'), vehicle.driver_id.name or None,
+                distance, total_distance,
+            ))
+            live_rows.append((
+                vehicle.id, str(position_id) if position_id else '', fix_time or None,
+                latitude or 0.0, longitude or 0.0, altitude or 0.0, speed or 0.0, accuracy or 0.0,
+                self.compute_device_status(device),
+            ))
+
+        self._write_traccar_devices(device_rows)
+        self.env['collecte.vehicle.live']._upsert(live_rows, LIVE_COLUMNS)
+
+        self._ingest_odometer_readings(odometer_readings)
+
+        return self._traccar_sync_notification(errors)
+
+    @api.model
+    def _write_traccar_devices(self, rows):
+        """Store ``(vehicle_id, device_id, name, driver_name, distance, total_distance)`` rows in one UPDATE.
+
+        None of these fields is tracked, so no chatter message is lost by
+        bypassing ``write``; access rights and record rules are still checked
+        on the updated vehicles first.
+        """
+        if not rows:
+            return
+        self.browse([row[0] for row in rows]).check_access('write')
+        self.env.cr.execute(f"""
+            UPDATE fleet_vehicle AS v
+               SET traccar_device_id = d.device_id, traccar_name = d.name,
+                   traccar_driver_name = d.driver_name, traccar_distance = d.distance,
+                   traccar_total_distance = d.total_distance,
+                   write_uid = %s, write_date = (now() at time zone 'UTC')
+              FROM (VALUES {', '.join(['(%s, %s, %s, %s, %s::float8, %s::float8)'] * len(rows))})
+                   AS d(id, device_id, name, driver_name, distance, total_distance)
+             WHERE v.id = d.id
+        """, [self.env.uid] + [value for row in rows for value in row])
+        self.invalidate_model(['traccar_device_id', 'traccar_name', 'traccar_driver_name',
+                               'traccar_distance', 'traccar_total_distance', 'write_uid', 'write_date'])
+
+    @api.model
+    def _ingest_odometer_readings(self, readings):
+        """Record ``(vehicle_id, value_km)`` readings, skipping redundant ones.
+
+        A reading is stored only when it differs from the vehicle's last one
+        by more than ``collecte.odometer_min_delta_km`` or when the last one
+        is at least ``collecte.odometer_min_interval_days`` old. The kept
+        readings are created in one batch.
+        """
+        if not readings:
+            return self.env['fleet.vehicle.odometer']
+        ICP = self.env['ir.config_parameter'].sudo()
+        min_delta = float(ICP.get_param('collecte.odometer_min_delta_km', 1.0))
+        min_interval = int(ICP.get_param('collecte.odometer_min_interval_days', 1))
+
+        self.env['fleet.vehicle.odometer'].flush_model(['vehicle_id', 'value', 'date'])
+        self.env.cr.execute("""
+            SELECT DISTINCT ON (vehicle_id) vehicle_id, value, date
+              FROM fleet_vehicle_odometer
+             WHERE vehicle_id IN %s
+          ORDER BY vehicle_id, date DESC, id DESC
+        """, (tuple({vehicle_id for vehicle_id, _ in readings}),))
+        last = {vehicle_id: (value, date) for vehicle_id, value, date in self.env.cr.fetchall()}
+
+        today = fields.Date.context_today(self)
+        vals_list = []
+        for vehicle_id, value in readings:
+            previous = last.get(vehicle_id)
+            if previous:
+                last_value, last_date = previous
+                moved = abs(value - (last_value or 0.0)) > min_delta
+                stale = not last_date or (today - last_date).days >= min_interval
+                if not (moved or stale):
+                    continue
+            vals_list.append({
+                'vehicle_id': vehicle_id,
+                'value': value,
+                'unit': 'kilometers',
+                'date': today,
             })
-
-        except Exception as e:
-            raise Exception(f"Error syncing with Traccar: {str(e)}")
-
+            last[vehicle_id] = (value, today)
+        return self.env['fleet.vehicle.odometer'].create(vals_list)
+
+    @api.model
+    def _cron_compact_odometers(self):
+        """Thin readings older than the retention period to one per vehicle and day."""
+        ICP = self.env['ir.config_parameter'].sudo()
+        retention_days = int(ICP.get_param('collecte.odometer_retention_days', 90))
+        limit_date = fields.Date.context_today(self) - timedelta(days=retention_days)
+
+        self.env['fleet.vehicle.odometer'].flush_model()
+        # On garde le relevé le plus élevé (puis le plus récent) de chaque jour
+        self.env.cr.execute("""
+            DELETE FROM fleet_vehicle_odometer
+             WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, row_number() OVER (
+                               PARTITION BY vehicle_id, date ORDER BY value DESC, id DESC) AS rank
+                      FROM fleet_vehicle_odometer
+                     WHERE date < %s
+                ) ranked
+                WHERE rank > 1
+             )
+        """, (limit_date,))
+        removed = self.env.cr.rowcount
+        self.env['fleet.vehicle.odometer'].invalidate_model()
+        _logger.info("[ODOMETER] %s reading(s) compacted before %s", removed, limit_date)
+        return removed
+
+    @api.model
+    def _get_traccar_sync_concurrency(self):
+        try:
+            return max(1, int(self.env['ir.config_parameter'].sudo().get_param('collecte.traccar_sync_concurrency', 4)))
+        except ValueError:
+            return 4
+
+    def _traccar_sync_notification(self, errors):
+        lines = []
+        for vehicle in self:
+            if vehicle.id in errors:
+                lines.append(f"✗ {vehicle.display_name} : {errors[vehicle.id]}")
+            else:
+                lines.append(f"✓ {vehicle.display_name}")
+        synced = len(self) - len(errors)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': f"Traccar : {synced}/{len(self)} véhicule(s) synchronisé(s)",
+                'message': "\n".join(lines),
+                'type': 'warning' if errors else 'success',
+                'sticky': bool(errors),
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            },
+        }
 
 
 class FleetVehicleModel(models.Model):
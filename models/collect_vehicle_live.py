@@ -0,0 +1,77 @@
+from odoo import api, models, fields
+
+# Nombre de lignes par requête INSERT ... ON CONFLICT
+LIVE_BATCH_SIZE = 500
+
+LIVE_COLUMNS = (
+    'position_id', 'last_fix_time', 'latitude', 'longitude',
+    'altitude', 'speed', 'accuracy', 'status',
+)
+
+
+class CollectVehicleLive(models.Model):
+    _name = 'collecte.vehicle.live'
+    _description = 'Dernière position connue du véhicule'
+    # Table étroite, sans suivi ni colonnes create/write : mise à jour à chaque tick
+    _log_access = False
+
+    vehicle_id = fields.Many2one('fleet.vehicle', string='Véhicule', required=True, ondelete='cascade')
+    position_id = fields.Char(string='Position ID')
+    last_fix_time = fields.Datetime(string='Last Fix Time')
+    latitude = fields.Float()
+    longitude = fields.Float()
+    altitude = fields.Float()
+    speed = fields.Float()
+    accuracy = fields.Float()
+    status = fields.Char(string='Status')
+    updated_at = fields.Datetime(string='Mis à jour le')
+
+    _sql_constraints = [
+        ('vehicle_uniq', 'unique(vehicle_id)', "Une seule position courante par véhicule."),
+    ]
+
+    def init(self):
+        # Transaction de la dernière écriture (bigint, hors ORM) : curseur des lectures incrémentales
+        self.env.cr.execute("""
+            ALTER TABLE collecte_vehicle_live ADD COLUMN IF NOT EXISTS write_txid bigint;
+            CREATE INDEX IF NOT EXISTS collecte_vehicle_live_write_txid_idx ON collecte_vehicle_live (write_txid)
+        """)
+
+    @api.model
+    def _upsert(self, rows, columns):
+        """Insert or update ``(vehicle_id, *values)`` rows for ``columns``.
+
+        Only the listed columns are overwritten on existing rows; every
+        upserted row gets a fresh ``updated_at`` and the current transaction
+        id in ``write_txid`` (see :meth:`_snapshot_cursor`).
+        """
+        assert set(columns) <= set(LIVE_COLUMNS)
+        if not rows:
+            return 0
+        cr = self.env.cr
+        placeholders = ('(' + ', '.join(['%s'] * (len(columns) + 1))
+                        + ", (clock_timestamp() at time zone 'UTC'), txid_current())")
+        assignments = ', '.join(f'{column} = EXCLUDED.{column}' for column in columns)
+        for start in range(0, len(rows), LIVE_BATCH_SIZE):
+            chunk = rows[start:start + LIVE_BATCH_SIZE]
+            cr.execute(f"""
+                INSERT INTO collecte_vehicle_live (vehicle_id, {', '.join(columns)}, updated_at, write_txid)
+                VALUES {', '.join([placeholders] * len(chunk))}
+                ON CONFLICT (vehicle_id) DO UPDATE
+                   SET {assignments}, updated_at = EXCLUDED.updated_at, write_txid = EXCLUDED.write_txid
+            """, [value for row in chunk for value in row])
+        self.invalidate_model()
+        self.env['fleet.vehicle'].invalidate_model(
+            ['traccar_live_ids'] + [f'traccar_{column}' for column in columns])
+        return len(rows)
+
+    @api.model
+    def _snapshot_cursor(self):
+        """Cursor covering every write visible to the current transaction.
+
+        Transactions older than the snapshot ``xmin`` are all committed, so a
+        later read of the rows with ``write_txid >= cursor`` misses no write,
+        whatever the order in which concurrent writers committed.
+        """
+        self.env.cr.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+        return self.env.cr.fetchone()[0]
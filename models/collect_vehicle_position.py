@@ -0,0 +1,113 @@
+from odoo import api, models, fields
+from datetime import datetime, timezone
+
+from ..tools.geo import douglas_peucker, encode_polyline, find_stops, tolerance_for_zoom
+
+# Nombre de lignes par requête INSERT multi-lignes
+POSITION_BATCH_SIZE = 1000
+
+
+class CollectVehiclePosition(models.Model):
+    _name = 'collecte.vehicle.position'
+    _description = 'Historique des positions GPS'
+    _order = 'fix_time'
+    # Table en ajout seul : pas de colonnes create/write_uid/date
+    _log_access = False
+
+    vehicle_id = fields.Many2one('fleet.vehicle', string='Véhicule', required=True, ondelete='cascade')
+    fix_time = fields.Datetime(string='Heure du fix', required=True)
+    latitude = fields.Float()
+    longitude = fields.Float()
+    speed = fields.Float()
+    course = fields.Float()
+
+    # Un seul index (véhicule, heure) : sert aux requêtes par période
+    # et à ignorer les positions déjà enregistrées
+    _sql_constraints = [
+        ('vehicle_fix_time_uniq', 'unique(vehicle_id, fix_time)',
+         "Une position existe déjà pour ce véhicule à cette heure."),
+    ]
+
+    @staticmethod
+    def parse_fix_time(value):
+        """Convert a Traccar ISO timestamp into a naive UTC datetime."""
+        if not value:
+            return None
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        if parsed.tzinfo:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+
+    @api.model
+    def _append_positions(self, rows):
+        """Bulk insert (vehicle_id, fix_time, lat, lon, speed, course) tuples.
+
+        Rows already stored for the same vehicle and fix time are ignored.
+        """
+        rows = [row for row in rows if row[1]]
+        for start in range(0, len(rows), POSITION_BATCH_SIZE):
+            chunk = rows[start:start + POSITION_BATCH_SIZE]
+            self.env.cr.execute(f"""
+                INSERT INTO collecte_vehicle_position
+                       (vehicle_id, fix_time, latitude, longitude, speed, course)
+                VALUES {', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(chunk))}
+                ON CONFLICT (vehicle_id, fix_time) DO NOTHING
+            """, [value for row in chunk for value in row])
+        return len(rows)
+
+    @api.model
+    def _read_track(self, vehicle_id, date_from, date_to):
+        self.env.cr.execute("""
+            SELECT fix_time, latitude, longitude, speed, course
+              FROM collecte_vehicle_position
+             WHERE vehicle_id = %s AND fix_time BETWEEN %s AND %s
+          ORDER BY fix_time
+        """, (vehicle_id, date_from, date_to))
+        return self.env.cr.fetchall()
+
+    @api.model
+    def get_track(self, vehicle_id, date_from, date_to):
+        return [{
+            'fix_time': fields.Datetime.to_string(fix_time),
+            'latitude': lat,
+            'longitude': lon,
+            'speed': speed,
+            'course': course,
+        } for fix_time, lat, lon, speed, course in self._read_track(vehicle_id, date_from, date_to)]
+
+    @api.model
+    def get_simplified_track(self, vehicle_id, date_from, date_to, zoom=13):
+        """Douglas-Peucker simplified track for ``zoom``, as an encoded polyline.
+
+        The first and last fix of every stop are kept exact and returned as
+        stop markers, together with the original and reduced point counts.
+        """
+        rows = self._read_track(vehicle_id, date_from, date_to)
+        points = [(lat, lon) for _, lat, lon, _, _ in rows]
+        if not points:
+            return {'polyline': '', 'stops': [], 'original_points': 0, 'reduced_points': 0}
+
+        times = [fix_time for fix_time, _, _, _, _ in rows]
+        stops = find_stops([speed for _, _, _, speed, _ in rows], times)
+        anchors = [i for stop in stops for i in stop]
+        tolerance = tolerance_for_zoom(zoom, points[0][0])
+        kept = douglas_peucker(points, tolerance, keep=anchors)
+
+        return {
+            'polyline': encode_polyline([points[i] for i in kept]),
+            'start': {'latitude': points[0][0], 'longitude': points[0][1],
+                      'fix_time': fields.Datetime.to_string(times[0])},
+            'end': {'latitude': points[-1][0], 'longitude': points[-1][1],
+                    'fix_time': fields.Datetime.to_string(times[-1])},
+            'stops': [{
+                'latitude': points[first][0],
+                'longitude': points[first][1],
+                'arrival': fields.Datetime.to_string(times[first]),
+                'departure': fields.Datetime.to_string(times[last]),
+            } for first, last in stops],
+            'original_points': len(points),
+            'reduced_points': len(kept),
+        }
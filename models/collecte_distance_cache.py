@@ -0,0 +1,138 @@
+from odoo import api, models, fields
+from odoo.tools.lru import LRU
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# ~11 m : deux saisies du même client tombent sur la même clé
+COORD_PRECISION = 4
+DEFAULT_TTL_DAYS = 30
+
+# Cache mémoire devant la table, propre à chaque worker
+_memory_cache = LRU(50000)
+
+
+def _round(point):
+    return round(float(point[0]), COORD_PRECISION), round(float(point[1]), COORD_PRECISION)
+
+
+class CollecteDistanceCache(models.Model):
+    _name = 'collecte.distance.cache'
+    _description = 'Cache des distances routières'
+    _log_access = False
+
+    # Coordonnées arrondies à COORD_PRECISION décimales
+    origin_lat = fields.Float(required=True)
+    origin_lon = fields.Float(required=True)
+    dest_lat = fields.Float(required=True)
+    dest_lon = fields.Float(required=True)
+    profile = fields.Char(required=True, default='driving-car')
+    distance_km = fields.Float(string="Distance (km)")
+    expires_at = fields.Datetime(required=True, index=True)
+
+    _sql_constraints = [
+        ('pair_profile_uniq', 'unique(origin_lat, origin_lon, dest_lat, dest_lon, profile)',
+         "Cette distance est déjà en cache."),
+    ]
+
+    @api.model
+    def _ttl(self):
+        try:
+            days = int(self.env['ir.config_parameter'].sudo().get_param('collecte.distance_cache_ttl_days', DEFAULT_TTL_DAYS))
+        except ValueError:
+            days = DEFAULT_TTL_DAYS
+        return timedelta(days=days)
+
+    @api.model
+    def lookup(self, pairs, profile='driving-car'):
+        """Return ``{(origin, dest): distance_km}`` for the cached pairs.
+
+        Points are ``(lat, lon)``; missing or expired pairs are left out.
+        The in-memory LRU is checked first, the remaining pairs are read
+        from the table in one query.
+        """
+        dbname = self.env.cr.dbname
+        found, missing = {}, {}
+        for origin, dest in pairs:
+            key = (dbname, profile, _round(origin), _round(dest))
+            hit = _memory_cache.get(key)
+            if hit is not None and hit[1] > fields.Datetime.now():
+                found[(origin, dest)] = hit[0]
+            else:
+                missing.setdefault(key[2:], []).append((origin, dest))
+        if not missing:
+            return found
+
+        self.env.cr.execute("""
+            SELECT c.origin_lat, c.origin_lon, c.dest_lat, c.dest_lon, c.distance_km, c.expires_at
+              FROM collecte_distance_cache c
+              JOIN unnest(%s::float8[], %s::float8[], %s::float8[], %s::float8[])
+                   AS k(origin_lat, origin_lon, dest_lat, dest_lon)
+                ON c.origin_lat = k.origin_lat AND c.origin_lon = k.origin_lon
+               AND c.dest_lat = k.dest_lat AND c.dest_lon = k.dest_lon
+             WHERE c.profile = %s AND c.expires_at > (now() at time zone 'UTC')
+        """, (
+            [o[0] for o, _ in missing], [o[1] for o, _ in missing],
+            [d[0] for _, d in missing], [d[1] for _, d in missing],
+            profile,
+        ))
+        for o_lat, o_lon, d_lat, d_lon, distance, expires_at in self.env.cr.fetchall():
+            rounded = ((o_lat, o_lon), (d_lat, d_lon))
+            _memory_cache[(dbname, profile) + rounded] = (distance, expires_at)
+            for pair in missing.get(rounded, []):
+                found[pair] = distance
+        return found
+
+    @api.model
+    def lookup_among(self, points, profile='driving-car'):
+        """Return ``{(i, k): distance_km}`` for the cached pairs between ``points``.
+
+        ``i`` and ``k`` are indexes in ``points``; one query covers the
+        whole set, so it is usable on thousands of points where
+        :meth:`lookup` would have to enumerate every pair.
+        """
+        if not points:
+            return {}
+        rounded = [_round(p) for p in points]
+        self.env.cr.execute("""
+            WITH pts AS (
+                SELECT * FROM unnest(%s::float8[], %s::float8[], %s::int[]) AS p(lat, lon, idx)
+            )
+            SELECT o.idx, d.idx, c.distance_km
+              FROM collecte_distance_cache c
+              JOIN pts o ON c.origin_lat = o.lat AND c.origin_lon = o.lon
+              JOIN pts d ON c.dest_lat = d.lat AND c.dest_lon = d.lon
+             WHERE c.profile = %s AND c.expires_at > (now() at time zone 'UTC')
+               AND o.idx != d.idx
+        """, ([p[0] for p in rounded], [p[1] for p in rounded], list(range(len(rounded))), profile))
+        return {(i, k): distance for i, k, distance in self.env.cr.fetchall()}
+
+    @api.model
+    def store(self, distances, profile='driving-car'):
+        """Upsert ``{(origin, dest): distance_km}`` with a fresh expiry date."""
+        if not distances:
+            return
+        dbname = self.env.cr.dbname
+        expires_at = fields.Datetime.now() + self._ttl()
+        rows = {}
+        for (origin, dest), distance in distances.items():
+            rounded = (_round(origin), _round(dest))
+            rows[rounded] = distance
+            _memory_cache[(dbname, profile) + rounded] = (distance, expires_at)
+        params = []
+        for ((o_lat, o_lon), (d_lat, d_lon)), distance in rows.items():
+            params.extend([o_lat, o_lon, d_lat, d_lon, profile, distance, expires_at])
+        self.env.cr.execute(f"""
+            INSERT INTO collecte_distance_cache
+                   (origin_lat, origin_lon, dest_lat, dest_lon, profile, distance_km, expires_at)
+            VALUES {', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(rows))}
+            ON CONFLICT (origin_lat, origin_lon, dest_lat, dest_lon, profile) DO UPDATE
+               SET distance_km = EXCLUDED.distance_km, expires_at = EXCLUDED.expires_at
+        """, params)
+
+    @api.model
+    def _cron_evict_expired(self):
+        self.env.cr.execute(
+            "DELETE FROM collecte_distance_cache WHERE expires_at <= (now() at time zone 'UTC')")
+        _logger.info("[DISTANCE] %s expired cache entrie(s) removed", self.env.cr.rowcount)
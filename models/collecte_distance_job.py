@@ -0,0 +1,84 @@
+from odoo import api, models, fields
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BATCH_SIZE = 500
+
+
+class CollecteDistanceJob(models.Model):
+    _name = 'collecte.distance.job'
+    _description = 'Calcul de distance en attente'
+    _order = 'next_attempt_at, id'
+
+    partner_id = fields.Many2one('res.partner', string="Client", required=True, ondelete='cascade', index=True)
+    state = fields.Selection([
+        ('pending', 'En attente'),
+        ('failed', 'Échec'),
+    ], default='pending', required=True, index=True)
+    attempts = fields.Integer(default=0)
+    next_attempt_at = fields.Datetime(default=fields.Datetime.now, required=True)
+    last_error = fields.Char()
+
+    def init(self):
+        # Une seule tâche en attente par client : les sauvegardes répétées se fusionnent
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS collecte_distance_job_pending_partner_uniq
+                ON collecte_distance_job (partner_id) WHERE state = 'pending'
+        """)
+
+    @api.model
+    def _enqueue(self, partner_ids):
+        self.env.cr.execute(f"""
+            INSERT INTO collecte_distance_job
+                   (partner_id, state, attempts, next_attempt_at, create_uid, create_date, write_uid, write_date)
+            VALUES {', '.join(["(%s, 'pending', 0, (now() at time zone 'UTC'), %s, "
+                               "(now() at time zone 'UTC'), %s, (now() at time zone 'UTC'))"] * len(partner_ids))}
+            ON CONFLICT (partner_id) WHERE state = 'pending' DO UPDATE
+               SET attempts = 0, next_attempt_at = EXCLUDED.next_attempt_at
+        """, [value for partner_id in partner_ids for value in (partner_id, self.env.uid, self.env.uid)])
+        # Le cron démarre une fois la transaction validée
+        self.env.ref('collecte_module.ir_cron_process_distance_jobs').sudo()._trigger()
+
+    @api.model
+    def _cron_process(self, limit=BATCH_SIZE):
+        self.env.cr.execute("""
+            SELECT id FROM collecte_distance_job
+             WHERE state = 'pending' AND next_attempt_at <= (now() at time zone 'UTC')
+          ORDER BY next_attempt_at, id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+        """, (limit,))
+        jobs = self.browse([row[0] for row in self.env.cr.fetchall()])
+        if not jobs:
+            return
+
+        distances = jobs.partner_id._calculate_distance()
+        jobs.partner_id._write_distances(distances)
+
+        done = jobs.filtered(lambda j: j.partner_id.id in distances)
+        done.unlink()
+        failed_partners = self.env['res.partner']
+        for job in jobs - done:
+            # Backoff exponentiel ; l'ancienne distance est conservée
+            attempts = job.attempts + 1
+            if attempts >= MAX_ATTEMPTS:
+                job.write({'state': 'failed', 'attempts': attempts, 'last_error': "ORS lookup failed"})
+                failed_partners |= job.partner_id
+            else:
+                job.write({
+                    'attempts': attempts,
+                    'next_attempt_at': fields.Datetime.now() + timedelta(minutes=2 ** attempts),
+                    'last_error': "ORS lookup failed",
+                })
+        if failed_partners:
+            self.env.cr.execute(
+                "UPDATE res_partner SET distance_state = 'failed' WHERE id IN %s", (tuple(failed_partners.ids),))
+            failed_partners.invalidate_recordset(['distance_state'])
+        _logger.info("[DISTANCE] %s job(s) done, %s rescheduled, %s failed",
+                     len(done), len(jobs - done) - len(failed_partners), len(failed_partners))
+
+        if len(jobs) == limit:
+            self.env.ref('collecte_module.ir_cron_process_distance_jobs').sudo()._trigger()
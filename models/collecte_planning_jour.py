@@ -1,8 +1,11 @@
 from odoo import models, fields, api
 from odoo.exceptions import UserError
-from sklearn.cluster import KMeans
 import logging
-import requests
+
+from ..tools.clustering import balanced_clusters, clusters_needed, project
+from ..tools.http_client import get_client
+from ..tools.routing import get_depot, get_routing_service
+from ..tools.sql import insert_rows
 
 _logger = logging.getLogger(__name__)
 
@@ -15,6 +18,7 @@ class DailyVehiclePlanning(models.Model):
     ligne_ids = fields.One2many('collecte.planning_journalier_ligne', 'planning_id', string="Destinations")
     total_quantite = fields.Float(string="Quantité totale (kg)", compute="_compute_total")
     monthly_id = fields.Many2one('collecte.planning_mensuel', string="Planning mensuel", index=True)
+    routing_provider = fields.Char(string="Source des distances", readonly=True)
 
     sql_constraints = [
         ('uniq_vehicle_date', 'unique(date, vehicle_id)', "Un planning existe déjà pour ce véhicule et cette date."),
@@ -28,14 +32,7 @@ class DailyVehiclePlanning(models.Model):
     # ---------- UTIL ----------
     @api.model
     def _get_origin_coords(self):
-        ICP = self.env['ir.config_parameter'].sudo()
-        try:
-            lat = float(ICP.get_param('collecte.origin_lat'))
-            lon = float(ICP.get_param('collecte.origin_lon'))
-        except Exception:
-            lat = 36.37065151015154
-            lon = 9.111696141592383
-        return lat, lon
+        return get_depot(self.env)
 
     @api.model
     def _get_time_params(self):
@@ -52,15 +49,6 @@ class DailyVehiclePlanning(models.Model):
         service_per_kg = _f('collecte.service_time_min_per_kg', 0.02)
         return speed_kmh, service_base, service_per_kg
 
-    @staticmethod
-    def _haversine_km(lat1, lon1, lat2, lon2):
-        from math import radians, sin, cos, asin, sqrt
-        R = 6371.0
-        dlat = radians(lat2 - lat1)
-        dlon = radians(lon2 - lon1)
-        a = sin(dlat/2.0)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2.0)**2
-        return 2.0 * R * asin(sqrt(a))
-
     # ---------- SERVICE ----------
     @api.model
     def generate_for_date(self, selected_date, replace_existing=True):
@@ -86,24 +74,32 @@ class DailyVehiclePlanning(models.Model):
         speed_kmh, service_base, service_per_kg = self._get_time_params()
 
         # 4) Points
+        origin = (ORIGIN_LAT, ORIGIN_LON)
+        geo_lines = lines.filtered(lambda l: l.partner_id.latitude and l.partner_id.longitude and l.quantite)
+        # Distance dépôt -> client : valeur routière du client, sinon cache /
+        # fournisseur de routage / estimation hors ligne
+        unknown = geo_lines.filtered(lambda l: not (l.partner_id.distance_from_origin > 0))
+        routing_service = get_routing_service(self.env, zones={
+            (l.partner_id.latitude, l.partner_id.longitude): l.partner_id.zone for l in unknown})
+        routed_km = dict(zip(unknown.ids, routing_service.one_to_many(
+            origin, [(l.partner_id.latitude, l.partner_id.longitude) for l in unknown])))
         points = []
-        for l in lines:
+        for l in geo_lines:
             p = l.partner_id
-            if p.latitude and p.longitude and l.quantite:
-                if p.distance_from_origin and p.distance_from_origin > 0:
-                    dist_from_depot = float(p.distance_from_origin)
-                else:
-                    dist_from_depot = self._haversine_km(ORIGIN_LAT, ORIGIN_LON, p.latitude, p.longitude)
-
-                points.append({
-                    'partner_id': p.id,
-                    'adresse': p.contact_address,
-                    'quantite': float(l.quantite),
-                    'lat': p.latitude,
-                    'lon': p.longitude,
-                    'dist': dist_from_depot,
-                    'zone': (p.zone or 'unknown'),
-                })
+            if l.id in routed_km:
+                dist_from_depot = float(routed_km[l.id])
+            else:
+                dist_from_depot = float(p.distance_from_origin)
+
+            points.append({
+                'partner_id': p.id,
+                'adresse': p.contact_address,
+                'quantite': float(l.quantite),
+                'lat': p.latitude,
+                'lon': p.longitude,
+                'dist': dist_from_depot,
+                'zone': (p.zone or 'unknown'),
+            })
         if not points:
             monthly.message_post(body=f"⚠️ Aucun client géolocalisé pour {selected_date}.")
             return self.browse()
@@ -112,52 +108,26 @@ class DailyVehiclePlanning(models.Model):
         vehicles = self.env['fleet.vehicle'].search([])
         if not vehicles:
             raise UserError("Aucun véhicule disponible.")
-        n_clusters = max(1, min(len(points), len(vehicles)))
 
-        # 6) Clustering
-        DIST_THRESHOLD = 150.0  # km – you can adjust this value
-
-        # Split into near vs far
-        near_points = [pt for pt in points if pt['dist'] <= DIST_THRESHOLD]
-        far_points = [pt for pt in points if pt['dist'] > DIST_THRESHOLD]
+        # 6) Clustering géographique équilibré : le cluster i est taillé pour le véhicule i
+        vehicles = vehicles.sorted(lambda v: v.capacity_kg or 999999, reverse=True)
+        capacities = [v.capacity_kg or 999999 for v in vehicles]
+        total_kg = sum(pt['quantite'] for pt in points)
+        n_clusters = max(1, min(len(points), clusters_needed(total_kg, capacities)))
+        xy = project([(pt['lat'], pt['lon']) for pt in points], origin)
+        labels = balanced_clusters(xy, [pt['quantite'] for pt in points], capacities[:n_clusters])
 
         clusters = {}
+        for pt, label in zip(points, labels):
+            clusters.setdefault(label, []).append(pt)
+        ordered = sorted(clusters.items())
 
-        # --- Normal clustering for near points ---
-        if near_points:
-            zones_sorted = sorted({pt['zone'] for pt in near_points})
-            zone_to_idx = {z: i for i, z in enumerate(zones_sorted)}
-            for pt in near_points:
-                pt['zone_idx'] = zone_to_idx[pt['zone']]
-
-            dists = [pt['dist'] for pt in near_points]
-            max_dist = max(dists) if dists else 1.0
-            zone_weight = max_dist * 2.0
-
-            X = [[pt['dist'], pt['zone_idx'] * zone_weight] for pt in near_points]
-            kmeans = KMeans(n_clusters=n_clusters, random_state=0).fit(X)
-
-            for idx, label in enumerate(kmeans.labels_):
-                clusters.setdefault(label, []).append(near_points[idx])
-
-        if far_points:
-            clusters[max(clusters.keys(), default=-1) + 1] = far_points
-            
-           
-        def cluster_sort_key(kv):
-            _, pts = kv
-            zmin = min(p.get('zone_idx', 999) for p in pts)  # handle far pts without zone_idx
-            dmin = min(p['dist'] for p in pts)
-            return (zmin, dmin)
-
-        ordered = sorted(clusters.items(), key=cluster_sort_key)
-
-        # 7) Remplacer les tournées existantes
+        # 7) Remplacer les tournées existantes (droits et règles d'accès appliqués par l'ORM)
         if replace_existing:
             self.search([('date', '=', selected_date)]).unlink()
 
         # 8) Création des tournées avec contrainte de capacité
-        created = self.browse()
+        tournees = []
         vehicle_index = 0
         for _, pts in ordered:
             pts.sort(key=lambda p: p['dist'])
@@ -178,7 +148,7 @@ class DailyVehiclePlanning(models.Model):
                         remaining_pts.append(pt)
 
                 # Création de la tournée
-                lignes_vals = []
+                tournee_vals = []
                 cum_min = 0.0
                 for ordre, pt in enumerate(sub_pts, start=1):
                     drive_dist = float(pt['dist'])
@@ -187,7 +157,7 @@ class DailyVehiclePlanning(models.Model):
                     service_min = (service_base + service_per_kg * pt['quantite'])
                     cum_min += drive_min + service_min
 
-                    lignes_vals.append((0, 0, {
+                    tournee_vals.append({
                         'partner_id': pt['partner_id'],
                         'adresse': pt['adresse'],
                         'quantite_collectee': pt['quantite'],
@@ -200,20 +170,27 @@ class DailyVehiclePlanning(models.Model):
                         'drive_time_min': round(drive_min, 1),
                         'service_time_min': round(service_min, 1),
                         'cumulative_time_min': round(cum_min, 1),
-                        'zone': pt['zone'],
-                    }))
+                    })
 
-                if lignes_vals:
-                    created |= self.create({
+                if tournee_vals:
+                    tournees.append(({
                         'date': selected_date,
                         'vehicle_id': vehicle.id,
                         'monthly_id': monthly.id,
-                        'ligne_ids': lignes_vals,
-                    })
+                        'routing_provider': routing_service.used_label,
+                    }, tournee_vals))
 
                 pts = remaining_pts
                 vehicle_index += 1
 
+        # Tournées créées ensemble, leurs lignes insérées en une fois
+        created = self.create([header for header, _ in tournees])
+        self.env['collecte.planning_journalier_ligne']._bulk_create([
+            dict(vals, planning_id=tournee.id)
+            for tournee, (_, tournee_vals) in zip(created, tournees)
+            for vals in tournee_vals
+        ])
+
         monthly.message_post(body=f"✅ {len(created)} tournée(s) créée(s) pour le {selected_date}.")
         return created
 
@@ -228,12 +205,11 @@ class DailyVehiclePlanning(models.Model):
         action['domain'] = [('id', 'in', recs.ids)]
         return action
     
-    ORS_API_KEY = "eyJvcmciOiI1YjNjZTM1OTc4NTExMTAwMDFjZjYyNDgiLCJpZCI6IjMxMzdlMmE5MjRlZjQ2OWFiN2QzYzM0OWM1ZjBmOWIzIiwiaCI6Im11cm11cjY0In0="
-
     def action_show_optimized_route(self):
         self.ensure_one()
 
-        origin = [9.111696, 36.370651]  # lon, lat depot
+        depot_lat, depot_lon = self._get_origin_coords()
+        origin = [depot_lon, depot_lat]  # lon, lat depot
         coords = [origin]
         clients = []
 
@@ -246,13 +222,10 @@ class DailyVehiclePlanning(models.Model):
             return
 
         try:
-            response = requests.post(
-                "https://api.openrouteservice.org/v2/directions/driving-car/geojson",
-                json={"coordinates": coords},
-                headers={"Authorization": self.ORS_API_KEY},
-                timeout=15
+            data = get_client(self.env, 'ors').post_json(
+                '/v2/directions/driving-car/geojson',
+                {"coordinates": coords},
             )
-            data = response.json()
 
             route = data["features"][0]
             geometry_coords = route["geometry"]["coordinates"]
@@ -304,4 +277,31 @@ class DailyVehiclePlanningLine(models.Model):
     drive_distance_km = fields.Float(string="Distance (km)")
     drive_time_min = fields.Float(string="Trajet (min)")
     service_time_min = fields.Float(string="Service (min)")
-    cumulative_time_min = fields.Float(string="Cumul (min)")
\ No newline at end of file
+    cumulative_time_min = fields.Float(string="Cumul (min)")
+
+    @api.model
+    def _bulk_create(self, vals_list):
+        """Insert planner output in batches, bypassing ``create``.
+
+        The related ``zone`` is read from the partners once. Returns the new ids.
+        """
+        if not vals_list:
+            return []
+        partners = self.env['res.partner'].browse({vals['partner_id'] for vals in vals_list})
+        zones = {p.id: p.zone or None for p in partners}
+        columns = (
+            'planning_id', 'partner_id', 'prev_partner_id', 'adresse', 'quantite_collectee',
+            'latitude', 'longitude', 'ordre', 'vehicle_id', 'drive_distance_km', 'drive_time_min',
+            'service_time_min', 'cumulative_time_min',
+        )
+        now = fields.Datetime.now()
+        uid = self.env.uid
+        rows = [
+            tuple(None if vals.get(column) is False else vals.get(column) for column in columns)
+            + (zones[vals['partner_id']], uid, now, uid, now)
+            for vals in vals_list
+        ]
+        ids = insert_rows(self.env.cr, self._table, columns + (
+            'zone', 'create_uid', 'create_date', 'write_uid', 'write_date'), rows)
+        self.env['collecte.planning_journalier'].invalidate_model(['ligne_ids', 'total_quantite'])
+        return ids
\ No newline at end of file
@@ -0,0 +1,127 @@
+from odoo import api, models, fields
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class CollectePlanningRun(models.Model):
+    _name = 'collecte.planning.run'
+    _description = 'Exécution de la génération de planning'
+    _order = 'started_at desc, id desc'
+
+    planning_id = fields.Many2one('collecte.planning_mensuel', string="Planning mensuel",
+                                  required=True, ondelete='cascade', index=True)
+    scope = fields.Selection([
+        ('full', 'Mois complet'),
+        ('stale', 'Jours modifiés'),
+    ], string="Portée", readonly=True)
+    state = fields.Selection([
+        ('running', 'En cours'),
+        ('paused', 'Interrompue (durée)'),
+        ('cancelled', 'Annulée'),
+        ('failed', 'Échec'),
+        ('done', 'Terminée'),
+    ], string="Statut", default='running', required=True, readonly=True, index=True)
+    started_at = fields.Datetime(string="Début", required=True, readonly=True, default=fields.Datetime.now)
+    finished_at = fields.Datetime(string="Fin", readonly=True)
+    error = fields.Char(string="Erreur", readonly=True)
+
+    # Taille du problème et préparation
+    client_count = fields.Integer(string="Clients", readonly=True)
+    day_count = fields.Integer(string="Jours à traiter", readonly=True)
+    num_vehicles = fields.Integer(string="Véhicules par cluster", readonly=True)
+    workers = fields.Integer(string="Processus", readonly=True)
+    matrix_size = fields.Integer(string="Taille de la matrice", readonly=True)
+    matrix_seconds = fields.Float(string="Construction matrice (s)", readonly=True)
+    routing_provider = fields.Char(string="Source des distances", readonly=True)
+
+    solve_ids = fields.One2many('collecte.planning.run.solve', 'run_id', string="Résolutions")
+    solve_count = fields.Integer(string="Problèmes", compute='_compute_totals', store=True)
+    solve_seconds = fields.Float(string="Résolution (s)", compute='_compute_totals', store=True)
+    objective = fields.Float(string="Objectif total", compute='_compute_totals', store=True)
+    dropped_stops = fields.Integer(string="Arrêts non planifiés", compute='_compute_totals', store=True)
+    time_limit_count = fields.Integer(string="Limite de temps atteinte", compute='_compute_totals', store=True)
+    no_solution_count = fields.Integer(string="Sans solution", compute='_compute_totals', store=True)
+
+    @api.depends('solve_ids.solve_seconds', 'solve_ids.objective', 'solve_ids.dropped_stops', 'solve_ids.status')
+    def _compute_totals(self):
+        for run in self:
+            solves = run.solve_ids
+            run.solve_count = len(solves)
+            run.solve_seconds = sum(solves.mapped('solve_seconds'))
+            run.objective = sum(solves.mapped('objective'))
+            run.dropped_stops = sum(solves.mapped('dropped_stops'))
+            run.time_limit_count = len(solves.filtered(lambda s: s.status == 'time_limit'))
+            run.no_solution_count = len(solves.filtered(lambda s: s.status == 'no_solution'))
+
+    def _log_results(self, jours, results):
+        """Record one solve per day/cluster result of :func:`~..tools.vrp.solve_all`."""
+        self.ensure_one()
+        vals_list = []
+        for result in results:
+            jour_idx, cluster_id = result['key']
+            stops = len(result['job_ids'])
+            served = sum(len(route) for route in result['routes'] or [])
+            vals_list.append({
+                'run_id': self.id,
+                'date': jours[jour_idx],
+                'cluster': cluster_id,
+                'stop_count': stops,
+                'demand_kg': result['demand_kg'],
+                'num_vehicles': result['num_vehicles'],
+                'vehicles_used': sum(1 for route in result['routes'] or [] if route),
+                'time_limit': result['time_limit'],
+                'solve_seconds': result['solve_time'],
+                'objective': result['objective'] or 0.0,
+                'cold_objective': result.get('cold_objective') or 0.0,
+                'cold_solve_seconds': result.get('cold_solve_time') or 0.0,
+                'dropped_stops': stops - served,
+                'strategy': result['strategy'],
+                'status': result['status'],
+                'solver_status': result['solver_status'],
+            })
+            if result['status'] == 'no_solution':
+                _logger.warning("[PLANNING] No solution for %s cluster %s (%s stop(s), solver status %s)",
+                                jours[jour_idx], cluster_id, stops, result['solver_status'])
+        return self.env['collecte.planning.run.solve'].create(vals_list)
+
+    def _finish(self, state, error=False):
+        self.write({'state': state, 'finished_at': fields.Datetime.now(), 'error': error})
+
+
+class CollectePlanningRunSolve(models.Model):
+    _name = 'collecte.planning.run.solve'
+    _description = "Résolution d'un jour / cluster"
+    _order = 'date, cluster, id'
+    _log_access = False
+
+    run_id = fields.Many2one('collecte.planning.run', string="Exécution", required=True,
+                             ondelete='cascade', index=True)
+    planning_id = fields.Many2one(related='run_id.planning_id', store=True, index=True)
+    date = fields.Date(string="Jour", required=True)
+    cluster = fields.Integer(string="Cluster")
+
+    # Taille du problème
+    stop_count = fields.Integer(string="Arrêts")
+    demand_kg = fields.Float(string="Demande (kg)")
+    num_vehicles = fields.Integer(string="Véhicules")
+    vehicles_used = fields.Integer(string="Véhicules utilisés")
+
+    # Résolution
+    time_limit = fields.Integer(string="Limite de temps (s)")
+    solve_seconds = fields.Float(string="Résolution (s)")
+    objective = fields.Float(string="Objectif", help="Distance parcourue en mètres")
+    cold_objective = fields.Float(string="Objectif à froid", help="Renseigné quand la comparaison à froid est active")
+    cold_solve_seconds = fields.Float(string="Résolution à froid (s)")
+    dropped_stops = fields.Integer(string="Arrêts non planifiés")
+    strategy = fields.Selection([
+        ('warm', 'À chaud'),
+        ('cold', 'À froid'),
+        ('cold_fallback', 'À froid (départ à chaud rejeté)'),
+    ], string="Stratégie")
+    status = fields.Selection([
+        ('solved', 'Résolu'),
+        ('time_limit', 'Limite de temps'),
+        ('no_solution', 'Sans solution'),
+    ], string="Statut", index=True)
+    solver_status = fields.Char(string="Statut OR-Tools")
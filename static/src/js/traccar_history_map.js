@@ -2,6 +2,7 @@
 
 import { registry } from "@web/core/registry";
 import { Component, onMounted, useRef } from "@odoo/owl";
+import { rpc } from "@web/core/network/rpc";
 
 export class TraccarHistoryMap extends Component {
     setup() {
@@ -9,57 +10,66 @@ export class TraccarHistoryMap extends Component {
         onMounted(this.initMap.bind(this));
     }
 
+    async fetchTrack(zoom) {
+        const { vehicle_id, date_from, date_to } = this.props.action?.params || {};
+        // Historique servi par Odoo (collecte.vehicle.position), simplifié pour le zoom
+        return rpc("/get_vehicle_track_history", {
+            vehicle_id,
+            date_from,
+            date_to,
+            zoom,
+        });
+    }
+
     async initMap() {
-        const { device_id, date_from, date_to } = this.props.action?.params || {};
         console.log("Received props:", this.props.action?.params);
 
-        const auth = btoa("pprologic138@gmail.com:oumaima123@");
-
-        const from = new Date(date_from).toISOString();
-        const to = new Date(date_to).toISOString();
-
-        const url = `https://demo4.traccar.org/api/reports/route?deviceId=${device_id}&from=${from}&to=${to}`;
-        console.log("Fetching Traccar data from:", url);
-
-        const response = await fetch(url, {
-            headers: {
-                "Authorization": `Basic ${auth}`,
-                "Accept": "application/json"
-            }
-        });
-
-        if (!response.ok) {
-            console.error("Traccar API error:", response.status, response.statusText);
-            alert(`Erreur API Traccar: ${response.statusText}`);
-            return;
-        }
+        const result = await this.fetchTrack(13);
 
-        let data;
-        try {
-            data = await response.json();
-        } catch (err) {
-            console.error("Erreur de parsing JSON:", err);
-            alert("Réponse API non valide (pas du JSON)");
+        if (result.status !== "success") {
+            console.error("Erreur historique GPS:", result.message);
+            alert(`Erreur historique GPS: ${result.message}`);
             return;
         }
 
-        if (!data.length) {
+        if (!result.original_points) {
             alert("Aucune donnée trouvée pour cette période.");
             return;
         }
 
-        const coordinates = data.map(pos => [pos.latitude, pos.longitude]);
-        const map = L.map(this.mapRef.el).setView(coordinates[0], 13);
+        const start = [result.start.latitude, result.start.longitude];
+        const map = L.map(this.mapRef.el).setView(start, 13);
 
         L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
             maxZoom: 19,
         }).addTo(map);
 
-        const route = L.polyline(coordinates, { color: 'blue' }).addTo(map);
-        map.fitBounds(route.getBounds());
+        const route = L.polyline(polyline.decode(result.polyline), { color: 'blue' }).addTo(map);
+
+        L.marker(start).addTo(map).bindPopup("Début").openPopup();
+        L.marker([result.end.latitude, result.end.longitude]).addTo(map).bindPopup("Fin");
+        for (const stop of result.stops) {
+            L.circleMarker([stop.latitude, stop.longitude], { radius: 6, color: 'red' })
+                .addTo(map)
+                .bindPopup(`Arrêt<br>${stop.arrival} → ${stop.departure}`);
+        }
 
-        L.marker(coordinates[0]).addTo(map).bindPopup("Début").openPopup();
-        L.marker(coordinates[coordinates.length - 1]).addTo(map).bindPopup("Fin");
+        // Re-simplifier la trace au niveau de zoom affiché
+        const tracks = { 13: result.polyline };
+        map.on("zoomend", async () => {
+            const zoom = map.getZoom();
+            if (!tracks[zoom]) {
+                const zoomed = await this.fetchTrack(zoom);
+                if (zoomed.status !== "success") {
+                    return;
+                }
+                tracks[zoom] = zoomed.polyline;
+            }
+            if (map.getZoom() === zoom) {
+                route.setLatLngs(polyline.decode(tracks[zoom]));
+            }
+        });
+        map.fitBounds(route.getBounds());
     }
 }
 
@@ -3,6 +3,7 @@
 import { registry } from "@web/core/registry";
 import { Component, onMounted, useRef } from "@odoo/owl";
 import { onWillUnmount } from "@odoo/owl";
+import { rpc } from "@web/core/network/rpc";
 
 export class TraccarRealtimeTrackingMap extends Component {
     setup() {
@@ -11,6 +12,7 @@ export class TraccarRealtimeTrackingMap extends Component {
         this.marker = null;
         this.polyline = null;
         this.path = [];
+        this.cursor = null;
         this.positionInterval = null;
 
         onMounted(this.initTracking.bind(this));
@@ -24,9 +26,6 @@ export class TraccarRealtimeTrackingMap extends Component {
 
     async initTracking() {
         const { device_id } = this.props.action.params;
-        const deviceIdNum = Number(device_id);
-        const auth = btoa("pprologic138@gmail.com:oumaima123@");
-        const url = "https://demo4.traccar.org/api/positions";
 
         if (!device_id) {
             alert("ID de l'appareil manquant.");
@@ -41,25 +40,18 @@ export class TraccarRealtimeTrackingMap extends Component {
 
         const updatePosition = async () => {
             try {
-                const response = await fetch(url, {
-                    headers: {
-                        "Authorization": `Basic ${auth}`,
-                        "Accept": "application/json"
-                    }
+                // Positions servies par Odoo, seulement celles modifiées depuis le curseur
+                const result = await rpc("/get_fleet_positions", {
+                    cursor: this.cursor,
+                    device_ids: [device_id],
                 });
+                this.cursor = result.cursor;
 
-                if (!response.ok) {
-                    throw new Error(`Erreur API: ${response.statusText}`);
-                }
-
-                const data = await response.json();
-                const devicePosition = data.find(d =>
-                    d.deviceId === deviceIdNum ||
-                    String(d.deviceId) === String(device_id)
+                const devicePosition = result.positions.find(d =>
+                    String(d.device_id) === String(device_id)
                 );
 
                 if (!devicePosition) {
-                    console.warn(`Pas de position pour l'appareil ${device_id}`);
                     return;
                 }
 
@@ -71,8 +63,11 @@ export class TraccarRealtimeTrackingMap extends Component {
                     pan: { duration: 1 }
                 });
 
-                // Add current point to trajectory
-                this.path.push(latlng);
+                // Add current point to trajectory (ignore resent positions)
+                const last = this.path[this.path.length - 1];
+                if (!last || last[0] !== latlng[0] || last[1] !== latlng[1]) {
+                    this.path.push(latlng);
+                }
 
                 // Update or create polyline
                 if (!this.polyline) {
@@ -0,0 +1,112 @@
+"""Capacity-balanced geographic clustering shared by the planners.
+
+Points are projected to a local plane in km (equirectangular around the
+depot, accurate enough at the scale of Tunisia), then grouped by a k-means
+whose assignment step respects a demand budget per cluster: points with the
+most to lose are placed first, each in the nearest cluster that still has
+room. Clusters therefore stay compact and each fits its vehicle.
+"""
+import math
+
+from . import lazy
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def project(points, origin):
+    """``(lat, lon)`` points to an ``n x 2`` array of km around ``origin``."""
+    np = lazy.numpy()
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    lat0, lon0 = map(math.radians, origin)
+    x = EARTH_RADIUS_KM * (np.radians(pts[:, 1]) - lon0) * math.cos(lat0)
+    y = EARTH_RADIUS_KM * (np.radians(pts[:, 0]) - lat0)
+    return np.column_stack([x, y])
+
+
+def clusters_needed(total_demand, capacities):
+    """Smallest number of the largest ``capacities`` covering ``total_demand``."""
+    covered = 0.0
+    for count, capacity in enumerate(sorted(capacities, reverse=True), start=1):
+        covered += capacity
+        if covered >= total_demand:
+            return count
+    return len(capacities)
+
+
+def _init_centers(xy, k, rng):
+    # k-means++ : premier centre tiré, les suivants pondérés par la distance au carré
+    np = lazy.numpy()
+    centers = [xy[rng.integers(len(xy))]]
+    for _ in range(1, k):
+        d2 = ((xy[:, None, :] - np.asarray(centers)[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+        total = d2.sum()
+        centers.append(xy[rng.choice(len(xy), p=d2 / total)] if total > 0 else xy[rng.integers(len(xy))])
+    return np.asarray(centers)
+
+
+def balanced_clusters(xy, demands, capacities, max_iter=25, seed=0):
+    """Cluster label of each point, with at most ``len(capacities)`` clusters.
+
+    Cluster ``c`` receives at most ``capacities[c]`` of demand; when the
+    total demand exceeds the total capacity the budgets are scaled up
+    evenly, so the overflow is shared instead of piling on one cluster.
+    A point larger than every remaining budget goes to its nearest cluster.
+    Deterministic for a given ``seed``.
+    """
+    np = lazy.numpy()
+    xy = np.asarray(xy, dtype=np.float64)
+    n, k = len(xy), len(capacities)
+    if n == 0:
+        return []
+    if k <= 1:
+        return [0] * n
+    if n <= k:
+        return list(range(n))
+
+    demands = np.asarray(demands, dtype=np.float64)
+    budgets = np.asarray(capacities, dtype=np.float64)
+    if demands.sum() > budgets.sum() > 0:
+        budgets = budgets * (demands.sum() / budgets.sum())
+
+    centers = _init_centers(xy, k, np.random.default_rng(seed))
+    labels = np.full(n, -1)
+    for _ in range(max_iter):
+        dist = np.sqrt(((xy[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2))
+        preference = np.argsort(dist, axis=1)
+        sorted_dist = np.take_along_axis(dist, preference, axis=1)
+        # Regret : écart entre le meilleur et le second centre
+        order = np.argsort(-(sorted_dist[:, 1] - sorted_dist[:, 0]), kind='stable')
+
+        load = np.zeros(k)
+        new_labels = np.empty(n, dtype=np.int64)
+        for i in order:
+            chosen = preference[i, 0]
+            for c in preference[i]:
+                if load[c] + demands[i] <= budgets[c]:
+                    chosen = c
+                    break
+            new_labels[i] = chosen
+            load[chosen] += demands[i]
+
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(k):
+            members = labels == c
+            if members.any():
+                centers[c] = xy[members].mean(axis=0)
+    return labels.tolist()
+
+
+def compactness(xy, labels):
+    """Mean distance (km) of the points to the centroid of their cluster."""
+    np = lazy.numpy()
+    xy = np.asarray(xy, dtype=np.float64)
+    labels = np.asarray(labels)
+    if not len(xy):
+        return 0.0
+    total = 0.0
+    for c in np.unique(labels):
+        members = xy[labels == c]
+        total += np.sqrt(((members - members.mean(axis=0)) ** 2).sum(axis=1)).sum()
+    return float(total / len(xy))
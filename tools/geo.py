@@ -0,0 +1,97 @@
+"""Track simplification and Google encoded-polyline helpers."""
+import math
+
+EARTH_RADIUS_M = 6371000.0
+# Mètres par pixel au zoom 0 à l'équateur (tuiles 256 px)
+METERS_PER_PIXEL_Z0 = 156543.03392
+
+
+def tolerance_for_zoom(zoom, latitude, pixels=1.0):
+    """Simplification tolerance (m) matching ``pixels`` on screen at ``zoom``."""
+    zoom = max(0, min(22, int(zoom)))
+    return pixels * METERS_PER_PIXEL_Z0 * math.cos(math.radians(latitude)) / (2 ** zoom)
+
+
+def _project(points):
+    # Projection équirectangulaire locale, suffisante à l'échelle d'une tournée
+    if not points:
+        return []
+    lat0 = math.radians(sum(p[0] for p in points) / len(points))
+    k = math.cos(lat0)
+    return [(math.radians(lon) * k * EARTH_RADIUS_M, math.radians(lat) * EARTH_RADIUS_M) for lat, lon in points]
+
+
+def _segment_distance(p, a, b):
+    (px, py), (ax, ay), (bx, by) = p, a, b
+    dx, dy = bx - ax, by - ay
+    if dx == 0 and dy == 0:
+        return math.hypot(px - ax, py - ay)
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / (dx * dx + dy * dy)))
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def douglas_peucker(points, tolerance, keep=()):
+    """Return the indexes of ``points`` (lat, lon) kept by Douglas-Peucker.
+
+    ``tolerance`` is in meters. Indexes listed in ``keep`` are always kept
+    and act as fixed anchors. Iterative, so long tracks do not hit the
+    recursion limit.
+    """
+    n = len(points)
+    if n <= 2:
+        return list(range(n))
+    xy = _project(points)
+    anchors = sorted({0, n - 1} | {i for i in keep if 0 <= i < n})
+    kept = set(anchors)
+    stack = list(zip(anchors, anchors[1:]))
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        max_dist, max_idx = -1.0, None
+        for i in range(start + 1, end):
+            d = _segment_distance(xy[i], xy[start], xy[end])
+            if d > max_dist:
+                max_dist, max_idx = d, i
+        if max_dist > tolerance:
+            kept.add(max_idx)
+            stack.append((start, max_idx))
+            stack.append((max_idx, end))
+    return sorted(kept)
+
+
+def find_stops(speeds, times, max_speed=1.0, min_duration=120):
+    """Return ``(first, last)`` index pairs of the stationary runs.
+
+    A run is a sequence of fixes with ``speed <= max_speed`` lasting at
+    least ``min_duration`` seconds; ``times`` are datetimes.
+    """
+    stops = []
+    start = None
+    for i, speed in enumerate(list(speeds) + [None]):
+        stationary = speed is not None and (speed or 0.0) <= max_speed
+        if stationary and start is None:
+            start = i
+        elif not stationary and start is not None:
+            end = i - 1
+            if (times[end] - times[start]).total_seconds() >= min_duration:
+                stops.append((start, end))
+            start = None
+    return stops
+
+
+def encode_polyline(points, precision=5):
+    """Encode (lat, lon) pairs with the Google polyline algorithm."""
+    factor = 10 ** precision
+    result = []
+    prev_lat = prev_lon = 0
+    for lat, lon in points:
+        lat_i, lon_i = int(round(lat * factor)), int(round(lon * factor))
+        for delta in (lat_i - prev_lat, lon_i - prev_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                result.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            result.append(chr(value + 63))
+        prev_lat, prev_lon = lat_i, lon_i
+    return ''.join(result)
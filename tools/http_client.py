@@ -0,0 +1,244 @@
+"""Shared outbound HTTP layer for the Traccar and OpenRouteService calls.
+
+Each process shares one ``requests.Session`` between its threads, with a
+pooled adapter sized for the concurrent calls, so keep-alive connections are
+reused across requests and threads. Every call has a bounded timeout,
+is retried with jittered exponential backoff on connection errors, 429 and
+5xx answers, and goes through a per-service circuit breaker so a slow
+provider cannot pin the Odoo workers. Latency and error counters are kept
+per service and endpoint, see :func:`get_stats`.
+"""
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Valeurs par défaut, surchargeables via ir.config_parameter
+SERVICES = {
+    'traccar': {
+        'url': ('collecte.traccar_url', 'https://demo4.traccar.org'),
+        'login': ('collecte.traccar_login', ''),
+        'password': ('collecte.traccar_password', ''),
+    },
+    'ors': {
+        'url': ('collecte.ors_url', 'https://api.openrouteservice.org'),
+        'api_key': ('collecte.ors_api_key', ''),
+    },
+    'osrm': {
+        'url': ('collecte.osrm_url', 'http://localhost:5000'),
+    },
+}
+DEFAULT_TIMEOUT = 15.0
+DEFAULT_RETRIES = 2
+BREAKER_THRESHOLD = 5
+BREAKER_RESET_SEC = 30.0
+# Connexions gardées ouvertes par hôte : threads HTTP d'Odoo + appels parallèles (synchro, matrices)
+POOL_MAXSIZE = 32
+
+_session_state = {'session': None, 'pid': None}
+_lock = threading.Lock()
+_breakers = {}
+_stats = {}
+
+
+class ServiceUnavailable(Exception):
+    """Raised when the circuit breaker of a service is open."""
+
+
+def _session():
+    # Une session par processus, partagée par ses threads ; recréée après un fork
+    with _lock:
+        if _session_state['session'] is None or _session_state['pid'] != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=POOL_MAXSIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session_state.update(session=session, pid=os.getpid())
+        return _session_state['session']
+
+
+class CircuitBreaker:
+    """Per-service breaker; callers hold ``_lock`` around its methods."""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset_after=BREAKER_RESET_SEC):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        now = time.monotonic()
+        if now - self.opened_at < self.reset_after:
+            return False
+        # Demi-ouvert : un seul appel d'essai, les autres échouent tout de suite
+        # (un essai sans réponse libère sa place après le délai)
+        if self.probe_started is not None and now - self.probe_started < self.reset_after:
+            return False
+        self.probe_started = now
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold or self.probe_started is not None:
+            self.opened_at = time.monotonic()
+            self.probe_started = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if time.monotonic() - self.opened_at >= self.reset_after else 'open'
+
+
+def _breaker(service):
+    with _lock:
+        return _breakers.setdefault(service, CircuitBreaker())
+
+
+def _record(service, endpoint, elapsed, error=None):
+    with _lock:
+        stat = _stats.setdefault((service, endpoint), {
+            'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'last_error': None,
+        })
+        stat['calls'] += 1
+        stat['total_ms'] += elapsed * 1000.0
+        stat['max_ms'] = max(stat['max_ms'], elapsed * 1000.0)
+        if error:
+            stat['errors'] += 1
+            stat['last_error'] = error
+
+
+def get_stats():
+    """Return the per-endpoint latency/error counters of this worker."""
+    with _lock:
+        result = []
+        for (service, endpoint), stat in sorted(_stats.items()):
+            result.append(dict(
+                stat,
+                service=service,
+                endpoint=endpoint,
+                avg_ms=round(stat['total_ms'] / stat['calls'], 1) if stat['calls'] else 0.0,
+                breaker=_breakers[service].state if service in _breakers else 'closed',
+            ))
+        return result
+
+
+def reset_stats():
+    with _lock:
+        _stats.clear()
+        _breakers.clear()
+
+
+def request(service, method, url, endpoint=None, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+            backoff=0.5, **kwargs):
+    """Send a request through the pooled session of the current process.
+
+    ``endpoint`` is the label used for the counters (defaults to the URL
+    path). Raises :class:`ServiceUnavailable` when the breaker is open and
+    ``requests.RequestException`` once the retries are exhausted.
+    """
+    endpoint = endpoint or requests.utils.urlparse(url).path
+    breaker = _breaker(service)
+    with _lock:
+        allowed = breaker.allow()
+    if not allowed:
+        _record(service, endpoint, 0.0, 'circuit open')
+        raise ServiceUnavailable(f"{service} is unavailable (circuit open)")
+
+    attempt = 0
+    while True:
+        started = time.monotonic()
+        try:
+            response = _session().request(method, url, timeout=timeout, **kwargs)
+            if response.status_code in RETRY_STATUSES:
+                raise requests.HTTPError(f"{response.status_code} {response.reason}", response=response)
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+            elapsed = time.monotonic() - started
+            _record(service, endpoint, elapsed, str(e))
+            with _lock:
+                breaker.record_failure()
+                allowed = breaker.opened_at is None
+            if attempt >= retries or not allowed:
+                raise
+            # Backoff exponentiel avec jitter, en respectant Retry-After si fourni
+            delay = backoff * (2 ** attempt) * (0.5 + random.random())
+            retry_after = getattr(getattr(e, 'response', None), 'headers', {}).get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, min(float(retry_after), 30.0))
+            attempt += 1
+            _logger.info("[HTTP] %s %s failed (%s), retry %s in %.2fs", method, url, e, attempt, delay)
+            time.sleep(delay)
+            continue
+        error = f"{response.status_code} {response.reason}" if response.status_code >= 400 else None
+        _record(service, endpoint, time.monotonic() - started, error)
+        with _lock:
+            breaker.record_success()
+        return response
+
+
+class ServiceClient:
+    """Client bound to one configured service (``traccar``, ``ors`` or ``osrm``)."""
+
+    def __init__(self, service, base_url, auth=None, headers=None, timeout=DEFAULT_TIMEOUT,
+                 retries=DEFAULT_RETRIES):
+        self.service = service
+        self.base_url = base_url.rstrip('/')
+        self.auth = auth
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.retries = retries
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        kwargs.setdefault('retries', self.retries)
+        if self.auth:
+            kwargs.setdefault('auth', self.auth)
+        headers = dict(self.headers, **kwargs.pop('headers', {}))
+        response = request(self.service, method, self.base_url + path, endpoint=path.split('?')[0],
+                           headers=headers, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def get_json(self, path, **kwargs):
+        return self.request('GET', path, **kwargs).json()
+
+    def post_json(self, path, payload, **kwargs):
+        return self.request('POST', path, json=payload, **kwargs).json()
+
+
+def get_client(env, service):
+    """Build the client of ``service`` from the ir.config_parameter settings."""
+    ICP = env['ir.config_parameter'].sudo()
+    conf = {key: ICP.get_param(param, default) for key, (param, default) in SERVICES[service].items()}
+
+    def _num(key, default, cast):
+        try:
+            return cast(ICP.get_param(key, default))
+        except (TypeError, ValueError):
+            return default
+
+    timeout = _num('collecte.http_timeout', DEFAULT_TIMEOUT, float)
+    retries = _num('collecte.http_retries', DEFAULT_RETRIES, int)
+    if service == 'traccar':
+        return ServiceClient(service, conf['url'], auth=(conf['login'], conf['password']),
+                             timeout=timeout, retries=retries)
+    if service == 'ors':
+        return ServiceClient(service, conf['url'], headers={'Authorization': conf['api_key']},
+                             timeout=timeout, retries=retries)
+    return ServiceClient(service, conf['url'], timeout=timeout, retries=retries)
@@ -0,0 +1,27 @@
+"""Heavy planning dependencies, imported on first use.
+
+NumPy and OR-Tools are only needed by the planners; importing them when
+the addon loads would make every worker (web, mobile API, cron) pay their
+start-up time and memory. Each loader imports once per process and returns
+the cached object afterwards.
+"""
+import functools
+
+
+@functools.cache
+def numpy():
+    import numpy
+    return numpy
+
+
+@functools.cache
+def ortools():
+    """``(pywrapcp, routing_enums_pb2)`` from OR-Tools."""
+    from ortools.constraint_solver import pywrapcp, routing_enums_pb2
+    return pywrapcp, routing_enums_pb2
+
+
+def preload():
+    """Load every heavy dependency now (e.g. in a dedicated planning worker)."""
+    numpy()
+    ortools()
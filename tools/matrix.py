@@ -0,0 +1,75 @@
+"""Vectorized distance and travel-time matrices for the planners.
+
+The full point-by-point matrices are computed once per planning run with
+NumPy broadcasting and stored compactly (float32 for kilometres, int32 for
+metres and seconds); each day/cluster slices the rows it needs by index.
+"""
+from . import lazy
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_matrix_km(lats, lons):
+    """Great-circle distances (km) between all points, as float32."""
+    np = lazy.numpy()
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2.0) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2.0) ** 2
+    return (2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))).astype(np.float32)
+
+
+def detour_factor_matrix(point_factors, default_factor):
+    """Pair factors: mean of both endpoints, a missing one (NaN) uses the other."""
+    np = lazy.numpy()
+    f = np.asarray(point_factors, dtype=np.float32)
+    fa, fb = f[:, None], f[None, :]
+    pair = np.where(np.isnan(fa), fb, np.where(np.isnan(fb), fa, (fa + fb) / 2.0))
+    return np.where(np.isnan(pair), np.float32(default_factor), pair).astype(np.float32)
+
+
+class DistanceMatrix:
+    """Distances (m) and travel times (s) between indexed points."""
+
+    def __init__(self, distance_km, speed_kmh):
+        np = lazy.numpy()
+        distance_km = np.asarray(distance_km, dtype=np.float32)
+        np.fill_diagonal(distance_km, 0.0)
+        self.distance_m = np.rint(distance_km * 1000.0).astype(np.int32)
+        speed_ms = max(1.0, speed_kmh * 1000.0 / 3600.0)
+        self.travel_sec = np.rint(self.distance_m / speed_ms).astype(np.int32)
+        self.speed_ms = speed_ms
+
+    @classmethod
+    def from_points(cls, points, speed_kmh, point_factors=None, default_factor=1.0, overrides=None):
+        """Build the matrices for ``points`` (lat, lon).
+
+        Distances are haversine times the detour factor of the pair;
+        ``overrides`` maps ``(i, k)`` index pairs to known road distances (km).
+        """
+        np = lazy.numpy()
+        lats = [p[0] for p in points]
+        lons = [p[1] for p in points]
+        distance_km = haversine_matrix_km(lats, lons)
+        if point_factors is not None:
+            distance_km *= detour_factor_matrix(point_factors, default_factor)
+        elif default_factor != 1.0:
+            distance_km *= np.float32(default_factor)
+        if overrides:
+            rows, cols = zip(*overrides.keys())
+            distance_km[list(rows), list(cols)] = list(overrides.values())
+        return cls(distance_km, speed_kmh)
+
+    def set_distances(self, idx, distance_km):
+        """Overwrite the sub-matrix ``idx`` x ``idx`` with road distances (km)."""
+        np = lazy.numpy()
+        idx = np.asarray(idx)
+        sub_m = np.rint(np.asarray(distance_km, dtype=np.float32) * 1000.0).astype(np.int32)
+        self.distance_m[np.ix_(idx, idx)] = sub_m
+        self.travel_sec[np.ix_(idx, idx)] = np.rint(sub_m / self.speed_ms).astype(np.int32)
+
+    def sub(self, idx):
+        """Distance and time sub-matrices for ``idx``, as plain int lists for OR-Tools."""
+        grid = lazy.numpy().ix_(idx, idx)
+        return self.distance_m[grid].tolist(), self.travel_sec[grid].tolist()
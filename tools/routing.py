@@ -0,0 +1,296 @@
+"""Routing providers behind one interface.
+
+Every provider exposes ``one_to_many(origin, destinations)`` and
+``matrix(origins, destinations)`` returning road distances in km (``None``
+when a pair could not be resolved). Points are ``(lat, lon)`` tuples.
+
+* :class:`OrsProvider` - OpenRouteService matrix API;
+* :class:`OsrmProvider` - OSRM-compatible ``/table`` server (e.g. local);
+* :class:`HaversineProvider` - offline great-circle distance multiplied by
+  a per-governorate detour factor.
+
+:class:`RoutingService` chains the distance cache, the configured provider
+and the haversine fallback, and records which providers answered.
+"""
+import json
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from .http_client import ServiceUnavailable, get_client
+from .matrix import DistanceMatrix
+
+_logger = logging.getLogger(__name__)
+
+# Dépôt par défaut, surchargeable via collecte.origin_lat / collecte.origin_lon
+DEPOT = (36.37065151015154, 9.111696141592383)
+DEFAULT_DETOUR_FACTOR = 1.3
+EARTH_RADIUS_KM = 6371.0
+
+
+def get_depot(env):
+    ICP = env['ir.config_parameter'].sudo()
+    try:
+        return float(ICP.get_param('collecte.origin_lat')), float(ICP.get_param('collecte.origin_lon'))
+    except (TypeError, ValueError):
+        return DEPOT
+
+
+def haversine_km(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    d = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(d))
+
+
+class RoutingProvider:
+    name = None
+
+    def matrix(self, origins, destinations):
+        raise NotImplementedError
+
+    def one_to_many(self, origin, destinations):
+        return self.matrix([origin], destinations)[0]
+
+
+class HaversineProvider(RoutingProvider):
+    name = 'haversine'
+
+    def __init__(self, factors=None, default_factor=DEFAULT_DETOUR_FACTOR, zones=None):
+        self.factors = factors or {}
+        self.default_factor = default_factor
+        # {(lat, lon): zone} pour appliquer le facteur du gouvernorat
+        self.zones = zones or {}
+
+    def _factor(self, a, b):
+        za, zb = self.zones.get(a), self.zones.get(b)
+        fa = self.factors.get(za, self.default_factor)
+        fb = self.factors.get(zb, self.default_factor)
+        if za is None:
+            return fb
+        if zb is None:
+            return fa
+        return (fa + fb) / 2.0
+
+    def matrix(self, origins, destinations):
+        return [[0.0 if o == d else haversine_km(o, d) * self._factor(o, d) for d in destinations]
+                for o in origins]
+
+
+class _ChunkedMatrixProvider(RoutingProvider):
+    """Split a matrix into requests of at most ``max_locations`` locations."""
+
+    def __init__(self, client, max_locations=50, concurrency=2):
+        self.client = client
+        self.max_locations = max(2, max_locations)
+        self.concurrency = max(1, concurrency)
+
+    def _request(self, origins, destinations):
+        raise NotImplementedError
+
+    def matrix(self, origins, destinations):
+        n_orig = max(1, min(len(origins), self.max_locations // 2))
+        if len(origins) == 1:
+            n_orig = 1
+        n_dest = self.max_locations - n_orig
+        blocks = [(i, k) for i in range(0, len(origins), n_orig) for k in range(0, len(destinations), n_dest)]
+
+        def _fetch(block):
+            i, k = block
+            sub_origins, sub_dests = origins[i:i + n_orig], destinations[k:k + n_dest]
+            try:
+                return block, self._request(sub_origins, sub_dests)
+            except Exception as e:
+                # Un bloc en échec n'invalide pas les autres
+                _logger.warning("[ROUTING] %s request failed for %sx%s location(s): %s",
+                                self.name, len(sub_origins), len(sub_dests), e)
+                return block, [[None] * len(sub_dests) for _ in sub_origins]
+
+        result = [[None] * len(destinations) for _ in origins]
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(blocks) or 1)) as executor:
+            for (i, k), rows in executor.map(_fetch, blocks):
+                for di, row in enumerate(rows):
+                    result[i + di][k:k + len(row)] = row
+        return result
+
+
+class OrsProvider(_ChunkedMatrixProvider):
+    name = 'ors'
+
+    def __init__(self, client, max_locations=50, concurrency=2, profile='driving-car'):
+        super().__init__(client, max_locations, concurrency)
+        self.profile = profile
+
+    def _request(self, origins, destinations):
+        payload = {
+            "locations": [[lon, lat] for lat, lon in list(origins) + list(destinations)],
+            "sources": list(range(len(origins))),
+            "destinations": list(range(len(origins), len(origins) + len(destinations))),
+            "metrics": ["distance"],
+            "units": "km",
+        }
+        data = self.client.post_json(f'/v2/matrix/{self.profile}', payload)
+        return data.get("distances") or [[None] * len(destinations) for _ in origins]
+
+
+class OsrmProvider(_ChunkedMatrixProvider):
+    name = 'osrm'
+
+    def __init__(self, client, max_locations=100, concurrency=4, profile='driving'):
+        super().__init__(client, max_locations, concurrency)
+        self.profile = profile
+
+    def _request(self, origins, destinations):
+        points = list(origins) + list(destinations)
+        coords = ';'.join(f'{lon},{lat}' for lat, lon in points)
+        params = {
+            'sources': ';'.join(str(i) for i in range(len(origins))),
+            'destinations': ';'.join(str(i) for i in range(len(origins), len(points))),
+            'annotations': 'distance',
+        }
+        data = self.client.get_json(f'/table/v1/{self.profile}/{coords}', params=params)
+        return [[d / 1000.0 if d is not None else None for d in row] for row in data.get('distances') or []]
+
+
+class RoutingService:
+    """Cache, then the configured providers in order, then haversine."""
+
+    def __init__(self, env, providers, fallback=None, profile='driving-car'):
+        self.env = env
+        self.providers = providers
+        self.fallback = fallback
+        self.profile = profile
+        self.used = set()
+
+    def matrix(self, origins, destinations):
+        cache = self.env['collecte.distance.cache']
+        pairs = [(o, d) for o in origins for d in destinations if o != d]
+        known = cache.lookup(pairs, profile=self.profile)
+        if known:
+            self.used.add('cache')
+        missing = [p for p in pairs if p not in known]
+
+        for provider in self.providers:
+            if not missing:
+                break
+            sub_origins = list(dict.fromkeys(o for o, _ in missing))
+            sub_dests = list(dict.fromkeys(d for _, d in missing))
+            try:
+                rows = provider.matrix(sub_origins, sub_dests)
+            except ServiceUnavailable as e:
+                _logger.info("[ROUTING] %s skipped: %s", provider.name, e)
+                continue
+            except Exception as e:
+                _logger.warning("[ROUTING] %s failed: %s", provider.name, e)
+                continue
+            fetched = {}
+            for o, row in zip(sub_origins, rows):
+                for d, dist in zip(sub_dests, row):
+                    if dist is not None and o != d:
+                        fetched[(o, d)] = dist
+            if fetched:
+                self.used.add(provider.name)
+                # Les estimations hors ligne ne polluent pas le cache routier
+                if provider.name != HaversineProvider.name:
+                    cache.store(fetched, profile=self.profile)
+                known.update(fetched)
+            missing = [p for p in missing if p not in known]
+
+        if missing and self.fallback:
+            sub_origins = list(dict.fromkeys(o for o, _ in missing))
+            sub_dests = list(dict.fromkeys(d for _, d in missing))
+            rows = self.fallback.matrix(sub_origins, sub_dests)
+            for o, row in zip(sub_origins, rows):
+                for d, dist in zip(sub_dests, row):
+                    known.setdefault((o, d), dist)
+            self.used.add(self.fallback.name)
+
+        return [[0.0 if o == d else known.get((o, d)) for d in destinations] for o in origins]
+
+    def one_to_many(self, origin, destinations):
+        return self.matrix([origin], destinations)[0]
+
+    def distance_matrix(self, points, speed_kmh):
+        """Full :class:`~.matrix.DistanceMatrix` between ``points``.
+
+        Haversine distances times the detour factors, computed in one
+        vectorized pass, overlaid with the cached road distances (one query).
+        External providers are only asked through :meth:`refine`.
+        """
+        estimate = self.fallback or HaversineProvider()
+        point_factors = []
+        for point in points:
+            zone = estimate.zones.get(point)
+            point_factors.append(math.nan if zone is None else estimate.factors.get(zone, estimate.default_factor))
+        overrides = self.env['collecte.distance.cache'].lookup_among(points, profile=self.profile)
+        if overrides:
+            self.used.add('cache')
+        if len(overrides) < len(points) * (len(points) - 1):
+            self.used.add(estimate.name)
+        return DistanceMatrix.from_points(points, speed_kmh, point_factors, estimate.default_factor, overrides)
+
+    def refine(self, distance_matrix, points, idx):
+        """Replace the ``idx`` sub-matrix with provider distances, if any is configured."""
+        if not self.providers:
+            return
+        sub_points = [points[i] for i in idx]
+        distance_matrix.set_distances(idx, self.matrix(sub_points, sub_points))
+
+    @property
+    def used_label(self):
+        return ', '.join(sorted(self.used)) or '-'
+
+
+def _detour_factors(env):
+    ICP = env['ir.config_parameter'].sudo()
+    try:
+        factors = json.loads(ICP.get_param('collecte.detour_factors') or '{}')
+    except ValueError:
+        factors = {}
+    try:
+        default = float(ICP.get_param('collecte.detour_factor_default', DEFAULT_DETOUR_FACTOR))
+    except ValueError:
+        default = DEFAULT_DETOUR_FACTOR
+    return factors, default
+
+
+def get_provider(env, name):
+    ICP = env['ir.config_parameter'].sudo()
+
+    def _int(key, default):
+        try:
+            return int(ICP.get_param(key, default))
+        except ValueError:
+            return default
+
+    if name == 'ors':
+        return OrsProvider(get_client(env, 'ors'),
+                           max_locations=_int('collecte.ors_matrix_max_locations', 50),
+                           concurrency=_int('collecte.ors_concurrency', 2))
+    if name == 'osrm':
+        return OsrmProvider(get_client(env, 'osrm'),
+                            max_locations=_int('collecte.osrm_max_locations', 100),
+                            concurrency=_int('collecte.osrm_concurrency', 4))
+    factors, default = _detour_factors(env)
+    return HaversineProvider(factors, default)
+
+
+def get_routing_service(env, purpose='planning', zones=None):
+    """Routing service configured for ``purpose``.
+
+    ``planning`` uses ``collecte.planning_routing_provider`` (default
+    ``haversine``, i.e. cache + offline estimate) and always falls back to
+    haversine, so planning never waits on an external API. ``partner`` uses
+    ``collecte.routing_provider`` (default ``ors``) without fallback: pairs
+    it cannot resolve are reported as missing and retried later.
+    """
+    ICP = env['ir.config_parameter'].sudo()
+    if purpose == 'planning':
+        name = ICP.get_param('collecte.planning_routing_provider', 'haversine')
+    else:
+        name = ICP.get_param('collecte.routing_provider', 'ors')
+    factors, default = _detour_factors(env)
+    haversine = HaversineProvider(factors, default, zones=zones)
+    providers = [] if name == 'haversine' else [get_provider(env, name)]
+    if purpose == 'planning':
+        return RoutingService(env, providers, fallback=haversine)
+    return RoutingService(env, providers or [haversine])
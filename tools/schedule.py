@@ -0,0 +1,53 @@
+"""Collection calendar: which partner is due on which day.
+
+:func:`collection_mask` evaluates the schedule of many partners over many
+days at once and returns a ``days x partners`` boolean array, so a day's
+job list is a single vector lookup instead of a per-partner evaluation.
+"""
+import calendar
+from datetime import date
+
+from . import lazy
+
+WEEKDAYS = ('lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi', 'samedi', 'dimanche')
+WORKING_DAYS = (0, 1, 2, 3, 4)
+
+
+def passage_weekdays(nb):
+    """Weekdays (0 = lundi) used for ``nb`` passages a week."""
+    step = max(1, len(WORKING_DAYS) // nb)
+    return WORKING_DAYS[::step][:nb]
+
+
+def planning_days(year, month):
+    """Days of the month the planners work on (every day but Sunday)."""
+    last = calendar.monthrange(year, month)[1]
+    return [date(year, month, d) for d in range(1, last + 1) if date(year, month, d).weekday() != 6]
+
+
+def collection_mask(days, schedules):
+    """Boolean ``len(days) x len(schedules)`` array of due collections.
+
+    ``schedules`` are ``(jour_fixe, nbre_passage_semaine, frequence_collecte)``
+    tuples as stored on the partner (empty values allowed). A partner is due
+    on a fixed weekday, on its weekly passage days, or every ``frequence``
+    days counted from the first day of the month.
+    """
+    np = lazy.numpy()
+    weekday = np.array([d.weekday() for d in days], dtype=np.int8)
+    offset = np.array([d.day - 1 for d in days], dtype=np.int16)
+
+    fixed = np.array([WEEKDAYS.index(jf) if jf in WEEKDAYS else -1 for jf, _, _ in schedules], dtype=np.int8)
+    mask = weekday[:, None] == fixed[None, :]
+
+    # Table jours de passage : ligne = nombre de passages, colonne = jour de semaine
+    passages = np.zeros((len(WORKING_DAYS) + 1, 7), dtype=bool)
+    for nb in range(1, len(WORKING_DAYS) + 1):
+        passages[nb, list(passage_weekdays(nb))] = True
+    nb = np.array([int(n) if n else 0 for _, n, _ in schedules], dtype=np.int8)
+    mask |= passages[nb][:, weekday].T
+
+    freq = np.array([int(f) if f else 0 for _, _, f in schedules], dtype=np.int16)
+    with_freq = freq > 0
+    mask[:, with_freq] |= (offset[:, None] % freq[with_freq][None, :]) == 0
+    return mask
@@ -0,0 +1,22 @@
+"""Batched SQL writes for generated data that needs no ORM side effects."""
+
+INSERT_BATCH_SIZE = 1000
+
+
+def insert_rows(cr, table, columns, rows, batch_size=INSERT_BATCH_SIZE):
+    """Insert ``rows`` (tuples ordered like ``columns``) into ``table``.
+
+    ``create_uid``/``write_uid`` are not filled in: callers add them to
+    ``columns`` when the table logs access. Returns the new ids, in order.
+    """
+    ids = []
+    placeholders = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    for start in range(0, len(rows), batch_size):
+        chunk = rows[start:start + batch_size]
+        cr.execute(f"""
+            INSERT INTO {table} ({', '.join(columns)})
+            VALUES {', '.join([placeholders] * len(chunk))}
+            RETURNING id
+        """, [value for row in chunk for value in row])
+        ids.extend(row[0] for row in cr.fetchall())
+    return ids
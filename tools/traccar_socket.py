@@ -0,0 +1,122 @@
+"""Consumer for the Traccar ``/api/socket`` push stream.
+
+Positions received from the socket are buffered per device for a short
+window and handed to a ``flush`` callback in one batch. The buffer keeps
+only the latest fix of each device, so a slow flush (database busy) never
+grows memory beyond one entry per device; while flushing, the socket is
+not read and the server-side TCP buffer provides the backpressure.
+"""
+import json
+import logging
+import time
+
+try:
+    import websocket
+except ImportError:
+    websocket = None
+
+_logger = logging.getLogger(__name__)
+
+
+class TraccarSocketConsumer:
+
+    def __init__(self, client, flush, batch_window=0.3, max_batch=2000, max_backoff=60.0):
+        # ``client`` : ServiceClient Traccar (voir http_client.get_client)
+        self.client = client
+        self.flush = flush
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_backoff = max_backoff
+        self.buffer = {}
+        self.running = False
+        self.stats = {'received': 0, 'flushed': 0, 'batches': 0, 'reconnects': 0}
+
+    @property
+    def socket_url(self):
+        base_url = self.client.base_url
+        if base_url.startswith('https://'):
+            return 'wss://' + base_url[len('https://'):] + '/api/socket'
+        return 'ws://' + base_url[len('http://'):] + '/api/socket'
+
+    def _open_session(self):
+        # Traccar authentifie la socket avec le cookie de session ; l'appel passe
+        # par le client partagé (retries, disjoncteur, compteurs)
+        login, password = self.client.auth
+        response = self.client.request('POST', '/api/session', data={'email': login, 'password': password})
+        return '; '.join(f'{k}={v}' for k, v in response.cookies.items())
+
+    def _connect(self):
+        cookie = self._open_session()
+        ws = websocket.create_connection(self.socket_url, cookie=cookie, timeout=15)
+        ws.settimeout(self.batch_window)
+        return ws
+
+    def handle_message(self, raw):
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            _logger.warning("[SOCKET] Invalid message ignored: %r", raw[:200])
+            return
+        for position in message.get('positions') or []:
+            device_id = position.get('deviceId')
+            current = self.buffer.get(device_id)
+            if current is None or (position.get('id') or 0) >= (current.get('id') or 0):
+                self.buffer[device_id] = position
+            self.stats['received'] += 1
+
+    def flush_buffer(self):
+        if not self.buffer:
+            return
+        positions = list(self.buffer.values())
+        self.buffer = {}
+        self.flush(positions)
+        self.stats['flushed'] += len(positions)
+        self.stats['batches'] += 1
+
+    def _consume(self, ws):
+        window_start = time.monotonic()
+        while self.running:
+            try:
+                raw = ws.recv()
+                if not raw:
+                    raise websocket.WebSocketConnectionClosedException("empty frame")
+                self.handle_message(raw)
+            except websocket.WebSocketTimeoutException:
+                pass
+            now = time.monotonic()
+            if now - window_start >= self.batch_window or len(self.buffer) >= self.max_batch:
+                self.flush_buffer()
+                window_start = now
+
+    def run(self):
+        """Consume the stream until :meth:`stop`, reconnecting with backoff."""
+        if websocket is None:
+            raise RuntimeError("The 'websocket-client' package is required for the Traccar socket consumer.")
+        self.running = True
+        backoff = 1.0
+        while self.running:
+            ws = None
+            try:
+                ws = self._connect()
+                _logger.info("[SOCKET] Connected to %s", self.socket_url)
+                backoff = 1.0
+                self._consume(ws)
+            except Exception as e:
+                if not self.running:
+                    break
+                self.stats['reconnects'] += 1
+                _logger.warning("[SOCKET] Connection lost (%s), reconnecting in %.0fs", e, backoff)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            finally:
+                # Ne pas perdre les positions reçues avant la coupure
+                try:
+                    self.flush_buffer()
+                except Exception:
+                    _logger.exception("[SOCKET] Flush failed, %s position(s) dropped", len(self.buffer))
+                    self.buffer = {}
+                if ws is not None:
+                    ws.close()
+
+    def stop(self):
+        self.running = False
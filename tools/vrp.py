@@ -0,0 +1,181 @@
+"""Day/cluster vehicle routing problems solved outside the ORM.
+
+A problem is a plain dict (lists and numbers only) so it can be sent to a
+worker process; :func:`solve_vrp` returns a plain dict as well.
+:func:`solve_all` runs a list of problems serially or in a bounded process
+pool and always returns the results in the order of the problems.
+"""
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from . import lazy
+
+_logger = logging.getLogger(__name__)
+
+
+def solve_vrp(problem):
+    """Solve one capacitated VRP with time windows.
+
+    ``problem`` keys: ``key``, ``distance_m`` and ``travel_sec`` (square
+    int matrices, node 0 is the depot), ``demands`` and ``service`` (per
+    node), ``time_windows`` (per node, in seconds from midnight),
+    ``num_vehicles``, ``capacity``, ``day_end``, ``time_limit`` (s) and
+    optional ``solution_limit``, ``initial_routes`` (per vehicle, the node
+    order of a previous solution, completed with :func:`complete_routes`
+    and used as warm start) and ``compare_cold``
+    (also solve from scratch, for reporting).
+
+    Returns ``{'key', 'routes', 'objective', 'solve_time', 'warm_start',
+    'strategy', 'status', 'solver_status'}`` where ``routes`` holds, per vehicle, the
+    visited ``(node, arrival_sec)`` (depot excluded), or is ``None`` when no
+    solution was found. ``status`` is ``solved``, ``time_limit`` (solution
+    found, search stopped by the time limit) or ``no_solution``;
+    ``strategy`` is ``warm``, ``cold`` or ``cold_fallback`` (warm start
+    rejected);
+    ``solver_status`` is the raw OR-Tools status name. With
+    ``compare_cold``, ``cold_objective`` and ``cold_solve_time`` are added.
+    """
+    pywrapcp, routing_enums_pb2 = lazy.ortools()
+    distance_m = problem['distance_m']
+    travel_sec = problem['travel_sec']
+    demands = problem['demands']
+    service = problem['service']
+    num_vehicles = problem['num_vehicles']
+    n = len(distance_m)
+
+    manager = pywrapcp.RoutingIndexManager(n, num_vehicles, 0)
+    routing = pywrapcp.RoutingModel(manager)
+
+    def dist_cb(from_index, to_index):
+        return distance_m[manager.IndexToNode(from_index)][manager.IndexToNode(to_index)]
+    dist_idx = routing.RegisterTransitCallback(dist_cb)
+    routing.SetArcCostEvaluatorOfAllVehicles(dist_idx)
+
+    def demand_cb(from_index):
+        return demands[manager.IndexToNode(from_index)]
+    demand_idx = routing.RegisterUnaryTransitCallback(demand_cb)
+    routing.AddDimensionWithVehicleCapacity(
+        demand_idx, 0, [problem['capacity']] * num_vehicles, True, "Capacity")
+
+    def time_cb(from_index, to_index):
+        from_node = manager.IndexToNode(from_index)
+        return service[from_node] + travel_sec[from_node][manager.IndexToNode(to_index)]
+    time_idx = routing.RegisterTransitCallback(time_cb)
+    routing.AddDimension(time_idx, 3600, problem['day_end'] + 3600, False, "Time")
+    time_dim = routing.GetDimensionOrDie("Time")
+    for node in range(1, n):
+        tw_start, tw_end = problem['time_windows'][node]
+        time_dim.CumulVar(manager.NodeToIndex(node)).SetRange(tw_start, tw_end)
+
+    search_params = pywrapcp.DefaultRoutingSearchParameters()
+    search_params.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
+    search_params.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
+    search_params.time_limit.FromSeconds(problem['time_limit'])
+    if problem.get('solution_limit'):
+        search_params.solution_limit = problem['solution_limit']
+
+    result = {'key': problem['key'], 'routes': None, 'objective': None, 'warm_start': False}
+    started = time.monotonic()
+    solution = None
+    initial = None
+    if problem.get('initial_routes'):
+        # Sans disjonction, une solution initiale doit visiter tous les noeuds
+        seed = complete_routes(problem['initial_routes'], distance_m, demands, problem['capacity'], num_vehicles)
+        routing.CloseModelWithParameters(search_params)
+        initial = routing.ReadAssignmentFromRoutes(
+            [[manager.NodeToIndex(node) for node in route] for route in seed], True)
+    if initial:
+        solution = routing.SolveFromAssignmentWithParameters(initial, search_params)
+        result['warm_start'] = bool(solution)
+    if not solution:
+        # Pas de solution précédente exploitable : départ à froid
+        solution = routing.SolveWithParameters(search_params)
+    result['solve_time'] = time.monotonic() - started
+    result['strategy'] = 'warm' if result['warm_start'] else (
+        'cold_fallback' if problem.get('initial_routes') else 'cold')
+    result['solver_status'] = _status_name(routing_enums_pb2, routing.status())
+    if not solution:
+        result['status'] = 'no_solution'
+    elif result['solve_time'] >= problem['time_limit'] * 0.98:
+        result['status'] = 'time_limit'
+    else:
+        result['status'] = 'solved'
+    if result['warm_start'] and problem.get('compare_cold'):
+        cold = dict(problem, initial_routes=None, compare_cold=False)
+        cold_result = solve_vrp(cold)
+        result.update(cold_objective=cold_result['objective'], cold_solve_time=cold_result['solve_time'])
+    if not solution:
+        return result
+
+    routes = []
+    for veh in range(num_vehicles):
+        route = []
+        index = routing.Start(veh)
+        while not routing.IsEnd(index):
+            node = manager.IndexToNode(index)
+            if node != 0:
+                route.append((node, solution.Value(time_dim.CumulVar(index))))
+            index = solution.Value(routing.NextVar(index))
+        routes.append(route)
+    result.update(routes=routes, objective=solution.ObjectiveValue())
+    return result
+
+
+def complete_routes(routes, distance_m, demands, capacity, num_vehicles):
+    """Return ``num_vehicles`` routes visiting every node of ``distance_m`` once.
+
+    Nodes of ``routes`` out of range or already visited are dropped; the
+    missing ones, heaviest first, are inserted where they add the least
+    distance, on a vehicle with room left when there is one.
+    """
+    n = len(distance_m)
+    seen = set()
+    completed = []
+    for route in routes[:num_vehicles]:
+        kept = []
+        for node in route:
+            if 0 < node < n and node not in seen:
+                seen.add(node)
+                kept.append(node)
+        completed.append(kept)
+    completed += [[] for _ in range(num_vehicles - len(completed))]
+    loads = [sum(demands[node] for node in route) for route in completed]
+
+    for node in sorted(set(range(1, n)) - seen, key=lambda node: (-demands[node], node)):
+        best = None
+        for veh, route in enumerate(completed):
+            overloaded = loads[veh] + demands[node] > capacity
+            path = [0] + route + [0]
+            for pos in range(len(path) - 1):
+                prev, nxt = path[pos], path[pos + 1]
+                added = distance_m[prev][node] + distance_m[node][nxt] - distance_m[prev][nxt]
+                if best is None or (overloaded, added) < best[0]:
+                    best = ((overloaded, added), veh, pos)
+        _, veh, pos = best
+        completed[veh].insert(pos, node)
+        loads[veh] += demands[node]
+    return completed
+
+
+def _status_name(routing_enums_pb2, status):
+    # L'énumération n'est exposée qu'à partir d'OR-Tools 9.5
+    try:
+        return routing_enums_pb2.RoutingSearchStatus.Value.Name(status)
+    except (AttributeError, ValueError):
+        return str(status)
+
+
+def solve_all(problems, workers=1):
+    """Solve ``problems``, in a pool of ``workers`` processes when above 1.
+
+    Results come back in the order of ``problems`` whatever the pool size.
+    """
+    workers = min(max(1, workers), len(problems))
+    if workers <= 1:
+        return [solve_vrp(problem) for problem in problems]
+    _logger.info("[PLANNING] Solving %s problem(s) with %s worker process(es)", len(problems), workers)
+    # fork : les enfants n'exécutent que le solveur, sans toucher au curseur
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+        return list(executor.map(solve_vrp, problems))
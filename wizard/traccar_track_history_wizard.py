@@ -40,6 +40,7 @@ class TraccarTrackHistoryWizard(models.TransientModel):
             'type': 'ir.actions.client',
             'tag': 'traccar_history_map',
             'params': {
+                'vehicle_id': self.vehicle_id.id,
                 'device_id': self.vehicle_id.traccar_device_id,
                 'date_from': self.date_from.isoformat() if self.date_from else '',
                 'date_to': self.date_to.isoformat() if self.date_to else '',